@@ -0,0 +1,172 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Augmented Dickey-Fuller test for many series at once
+Authors - L & JJ
+
+1. series is a 2-D array (pairs x time) of residuals of equal length,
+   a 1-D array is treated as a single series
+2. Same test as statsmodels adfuller(x, regression='n') (no constant,
+   the 'nc' option of older statsmodels): default maxlag
+   12*(nobs/100)^(1/4), lag chosen by AIC on the common sample, test
+   statistic from the refit at that lag
+3. Least squares of all series are solved together from stacked
+   normal equations; the lag search reuses one Gram matrix per series
+4. p-values and critical values from the MacKinnon (1994, 2010)
+   response surfaces, as statsmodels mackinnonp / mackinnoncrit
+5. Constant or non-finite series give NaN
+6. Gram matrices are summed over blocks of observations, so the lagged
+   design of long (intraday) series never exceeds config.CHUNK_CELLS
+   values at once
+"""
+
+import numpy as np
+from scipy.special import ndtr
+
+import config
+
+
+# MacKinnon coefficients for the no-constant case, N = 1
+_TAU_MIN = -19.04
+_TAU_STAR = -1.04
+_TAU_SMALLP = np.array([0.6344, 1.2378, 0.032496])
+_TAU_LARGEP = np.array([0.4797, 0.93557, -0.06999, 0.033066])
+_TAU_2010 = np.array([[-2.56574, -2.2358, -3.627, 0.0],
+                      [-1.94100, -0.2686, -3.365, 31.223],
+                      [-1.61682, 0.2656, -2.714, 25.364]])
+
+
+def default_maxlag(nobs):
+    maxlag = int(np.ceil(12.0 * np.power(nobs / 100.0, 1 / 4.0)))
+    return min(nobs // 2 - 1, maxlag)
+
+
+def mackinnon_pvalue(teststat):
+    teststat = np.asarray(teststat, dtype=np.float64)
+    small = np.polyval(_TAU_SMALLP[::-1], teststat)
+    large = np.polyval(_TAU_LARGEP[::-1], teststat)
+    pvalue = ndtr(np.where(teststat <= _TAU_STAR, small, large))
+    pvalue = np.where(teststat < _TAU_MIN, 0.0, pvalue)
+    return np.where(np.isnan(teststat), np.nan, pvalue)
+
+
+def mackinnon_crit(nobs):
+    # critical values at 1%, 5% and 10%
+    return np.polyval(_TAU_2010[:, ::-1].T, 1.0 / nobs)
+
+
+def _design(series, xdiff, lag, start, stop):
+    # lagged level and lag differences of observations start:stop, rows
+    # common to all lags <= lag
+    columns = [series[:, lag + start:lag + stop]]
+    for k in range(1, lag + 1):
+        columns.append(xdiff[:, lag - k + start:lag - k + stop])
+    design = np.stack(columns, axis=2)
+    target = xdiff[:, lag + start:lag + stop]
+
+    return design, target
+
+
+def _gram(series, lag):
+    # normal equations of the test regression, summed over blocks of
+    # observations
+    xdiff = np.diff(series, axis=1)
+    count = series.shape[0]
+    nobs = xdiff.shape[1] - lag
+    step = max(1, config.CHUNK_CELLS // max(count * (lag + 1), 1))
+
+    gram = np.zeros((count, lag + 1, lag + 1))
+    cross = np.zeros((count, lag + 1))
+    total = np.zeros(count)
+    for start in range(0, max(nobs, 1), step):
+        design, target = _design(series, xdiff, lag, start,
+                                 min(start + step, nobs))
+        gram += np.einsum("pti,ptj->pij", design, design)
+        cross += np.einsum("pti,pt->pi", design, target)
+        total += np.einsum("pt,pt->p", target, target)
+    return gram, cross, total, nobs
+
+
+def _solve(gram, cross):
+    # batched solve, singular systems (constant series) give NaN
+    coef = np.full(cross.shape, np.nan)
+    # sign of the determinant, det itself overflows for long series
+    ok = np.isfinite(gram).all(axis=(1, 2))
+    ok[ok] = np.linalg.slogdet(gram[ok])[0] != 0
+    if ok.any():
+        coef[ok] = np.linalg.solve(gram[ok], cross[ok][..., None])[..., 0]
+    return coef, ok
+
+
+def _tstat(series, lag):
+    gram, cross, total, nobs = _gram(series, lag)
+    k = lag + 1
+
+    coef, ok = _solve(gram, cross)
+    ssr = total - np.einsum("pi,pi->p", coef, cross)
+    sigma2 = ssr / (nobs - k)
+
+    unit = np.zeros(cross.shape)
+    unit[:, 0] = 1.0
+    inv00, _ = _solve(gram, unit)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tstat = coef[:, 0] / np.sqrt(sigma2 * inv00[:, 0])
+    tstat[~ok] = np.nan
+
+    return tstat, nobs
+
+
+def _aic_lags(series, maxlag):
+    # AIC of every lag 0..maxlag on the sample of the largest lag
+    gram, cross, total, nobs = _gram(series, maxlag)
+
+    aic = np.full((series.shape[0], maxlag + 1), np.nan)
+    for lag in range(maxlag + 1):
+        k = lag + 1
+        coef, ok = _solve(gram[:, :k, :k], cross[:, :k])
+        ssr = total - np.einsum("pi,pi->p", coef, cross[:, :k])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            llf = -nobs / 2.0 * (np.log(2 * np.pi) + np.log(ssr / nobs) + 1)
+        aic[:, lag] = -2.0 * llf + 2.0 * k
+
+    return aic
+
+
+def adf_batch(series, maxlag=None, autolag="AIC"):
+    # returns adf statistic, p-value, used lag and nobs for every series
+    series = np.atleast_2d(np.asarray(series, dtype=np.float64))
+    count, length = series.shape
+    if maxlag is None:
+        maxlag = default_maxlag(length)
+
+    bad = ~np.isfinite(series).all(axis=1) | \
+        (np.nanmax(series, axis=1) == np.nanmin(series, axis=1))
+    series = np.where(bad[:, None], 0.0, series)
+
+    if autolag is None:
+        usedlag = np.full(count, maxlag)
+    else:
+        aic = _aic_lags(series, maxlag)
+        aic[np.isnan(aic)] = np.inf
+        usedlag = np.argmin(aic, axis=1)
+
+    adfstat = np.full(count, np.nan)
+    nobs = np.zeros(count, dtype=int)
+    for lag in np.unique(usedlag):
+        rows = usedlag == lag
+        adfstat[rows], nobs[rows] = _tstat(series[rows], int(lag))
+    adfstat[bad] = np.nan
+
+    pvalue = mackinnon_pvalue(adfstat)
+    return adfstat, pvalue, usedlag, nobs
+
+
+def adf_pvalues(series_list, maxlag=None, autolag="AIC"):
+    # p-values for a list of series of any lengths, equal lengths are
+    # tested together
+    pvalues = np.full(len(series_list), np.nan)
+    lengths = np.array([len(series) for series in series_list])
+    for length in np.unique(lengths):
+        rows = np.nonzero(lengths == length)[0]
+        stacked = np.stack([series_list[k] for k in rows])
+        pvalues[rows] = adf_batch(stacked, maxlag, autolag)[1]
+    return pvalues
@@ -0,0 +1,124 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Alignment of price histories on their timestamps
+Authors - L & JJ
+
+1. Histories are joined on their int64 timestamps (sorted, ns since
+   epoch) with searchsorted, instead of rejecting unequal lengths
+2. Gap policy (config.ALIGN_POLICY):
+   drop    - only bars present in both histories (inner join)
+   ffill   - union of bars, a missing bar repeats the last close
+   max_gap - as ffill, but at most config.ALIGN_MAX_GAP bars in a row
+             are filled, longer gaps are dropped
+3. For the price matrix the fill is done once per symbol (fill_matrix),
+   every pair then takes the bars where both rows are finite
+4. Pairs with less than config.MIN_COMMON_BARS common bars are rejected;
+   the dates of the matrix a fitted pair has no common bar on are the
+   run_stats counter alignment_gaps (once per pair, scans only)
+5. pair_matrix does pair_rows for a batch of pairs at once, common bars
+   moved to the front of every row
+"""
+
+import numpy as np
+
+import config
+import run_stats
+
+
+def _fill_limit(policy, max_gap):
+    if policy == "drop":
+        return 0
+    elif policy == "ffill":
+        return None
+    elif policy == "max_gap":
+        return config.ALIGN_MAX_GAP if max_gap is None else max_gap
+    else:
+        raise ValueError("Unknown alignment policy: " + policy)
+
+
+def align_pair(times_1, close_1, times_2, close_2, policy=None,
+               max_gap=None):
+    # returns common timestamps and both close series on them
+    policy = policy or config.ALIGN_POLICY
+    limit = _fill_limit(policy, max_gap)
+
+    if len(times_1) == 0 or len(times_2) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0)
+
+    if limit == 0:
+        idx = np.searchsorted(times_2, times_1)
+        idx[idx == len(times_2)] = 0
+        match = times_2[idx] == times_1
+        times = times_1[match]
+        x = close_1[match]
+        y = close_2[idx[match]]
+    else:
+        times = np.union1d(times_1, times_2)
+        keep = np.ones(len(times), dtype=bool)
+        filled = []
+        for t, close in ((times_1, close_1), (times_2, close_2)):
+            # last own bar at or before every union timestamp
+            pos = np.searchsorted(t, times, side="right") - 1
+            keep &= pos >= 0
+            if limit is not None:
+                own = np.searchsorted(times, t[np.maximum(pos, 0)])
+                keep &= np.arange(len(times)) - own <= limit
+            filled.append(close[np.maximum(pos, 0)])
+        times = times[keep]
+        x = filled[0][keep]
+        y = filled[1][keep]
+
+    finite = np.isfinite(x) & np.isfinite(y)
+    return times[finite], x[finite], y[finite]
+
+
+def fill_matrix(prices, policy=None, max_gap=None):
+    # forward fill every row of a symbols x dates matrix per the policy
+    policy = policy or config.ALIGN_POLICY
+    limit = _fill_limit(policy, max_gap)
+    if limit == 0:
+        return prices
+
+    cols = np.arange(prices.shape[1])
+    valid = np.isfinite(prices)
+    last = np.maximum.accumulate(np.where(valid, cols, -1), axis=1)
+    fill = (last >= 0) & ~valid
+    if limit is not None:
+        fill &= cols - last <= limit
+
+    rows = np.nonzero(fill)
+    filled = prices.copy()
+    filled[rows] = prices[rows[0], last[rows]]
+    return filled
+
+
+def pair_rows(prices, i, j, count_gaps=False):
+    # both rows on their common bars as float64, None if too few are left;
+    # count_gaps adds the bars left out to run_stats alignment_gaps
+    common = np.isfinite(prices[i]) & np.isfinite(prices[j])
+    found = common.sum()
+    if found < config.MIN_COMMON_BARS:
+        return None
+    if count_gaps:
+        run_stats.count("alignment_gaps", len(common) - found)
+    return prices[i][common].astype(np.float64), \
+        prices[j][common].astype(np.float64)
+
+
+def pair_matrix(prices, x_idx, y_idx):
+    # X and Y rows of many pairs as float64 pairs x bars matrices, the
+    # common bars of every pair first (as pair_rows), NaN after them;
+    # also the number of common bars of every pair
+    x = np.asarray(prices[x_idx], dtype=np.float64)
+    y = np.asarray(prices[y_idx], dtype=np.float64)
+    common = np.isfinite(x) & np.isfinite(y)
+    counts = common.sum(axis=1)
+    if not common.all():
+        # stable sort keeps the order of the common bars
+        order = np.argsort(~common, axis=1, kind="stable")
+        x = np.take_along_axis(x, order, axis=1)
+        y = np.take_along_axis(y, order, axis=1)
+        tail = np.arange(x.shape[1])[None, :] >= counts[:, None]
+        x[tail] = np.nan
+        y[tail] = np.nan
+    return x, y, counts
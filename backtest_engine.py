@@ -0,0 +1,259 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Array based back test of threshold signals for many pairs
+Authors - L & JJ
+
+1. values (M1 cdf or M2 std. error), x and y prices are arrays of
+   pairs x time (1-D for a single pair); NaN bars (e.g. padding of
+   shorter pairs, see pad_rows) never open or close a trade
+2. A rule holds inclusive (low, high) bands:
+   long_entry / short_entry - an idle bar inside opens a LONG / SHORT
+   long_hold / short_hold   - the trade is closed on the first bar
+                              (the entry bar included) outside the band
+   the next trade can open on the bar after the exit, a trade still open
+   on the last bar is not counted
+3. Quantities from diophantine() of the entry prices, P/L (measure)
+   LONG  (y2-y1)*Y_qty + (x1-x2)*X_qty
+   SHORT (y1-y2)*Y_qty + (x2-x1)*X_qty
+4. find_trades gives the same trades as the per bar loop of the back
+   test scripts (loop_trades, kept as reference): next entry and next
+   exit of every bar come from reverse cumulative minimums, then all
+   pairs step from trade to trade together, so the Python loop runs
+   once per trade of the busiest pair instead of once per bar
+5. sweep_trades runs a grid of rules (m1_rule, m2_rule) over all pairs
+   in one pass: every (rule, pair) is a row of the same walk, the bands
+   are per row arrays; result is a rules x pairs surface of trades,
+   efficiency and P/L
+6. Long (intraday) histories are tested in fewer pairs at a time, rows
+   x bars stays under config.CHUNK_CELLS (pairs_per_batch, and the row
+   batches of sweep_trades)
+"""
+
+import math
+import numpy as np
+
+import config
+
+
+def diophantine(a, b):
+    # a*x - b*y = 0
+    d = math.gcd(int(a), int(b))
+    x = b/d
+    y = a*x/b
+    return int(x), int(y)
+
+
+def diophantine_arr(a, b):
+    # diophantine() of every element
+    d = np.gcd(a.astype(np.int64), b.astype(np.int64))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = b/d
+        y = a*x/b
+    return x.astype(np.int64), y.astype(np.int64)
+
+
+def _inside(values, band):
+    return (values >= band[0]) & (values <= band[1])
+
+
+def _outside(values, band):
+    return (values < band[0]) | (values > band[1])
+
+
+def _next_true(mask):
+    # index of the first True at or after every bar, length if none;
+    # one extra column so the bar after the last one can be looked up
+    count, length = mask.shape
+    idx = np.where(mask, np.arange(length), length)
+    idx = np.concatenate([idx, np.full((count, 1), length)], axis=1)
+    return np.minimum.accumulate(idx[:, ::-1], axis=1)[:, ::-1]
+
+
+def pad_rows(rows):
+    # list of 1-D arrays to a pairs x time matrix, padded with NaN
+    length = max([len(row) for row in rows] + [0])
+    matrix = np.full((len(rows), length), np.nan)
+    for k, row in enumerate(rows):
+        matrix[k, :len(row)] = row
+    return matrix
+
+
+def _trade_table(pair, entry, exit_, is_long, x, y):
+    x1 = x[pair, entry]
+    y1 = y[pair, entry]
+    x2 = x[pair, exit_]
+    y2 = y[pair, exit_]
+    X_qty, Y_qty = diophantine_arr(x1, y1)
+    measure = np.where(is_long,
+                       (y2-y1)*Y_qty + (x1-x2)*X_qty,
+                       (y1-y2)*Y_qty + (x2-x1)*X_qty)
+    return {"pair": pair, "entry": entry, "exit": exit_,
+            "long": is_long, "measure": measure,
+            "x_qty": X_qty, "y_qty": Y_qty}
+
+
+def _walk(values, rule):
+    # closed trades (row, entry, exit, long) ordered by row and entry bar;
+    # bands of the rule may be arrays of one value per row
+    count, length = values.shape
+    long_in = _inside(values, rule["long_entry"])
+    short_in = _inside(values, rule["short_entry"])
+    next_entry = _next_true(long_in | short_in)
+    next_long_out = _next_true(_outside(values, rule["long_hold"]))
+    next_short_out = _next_true(_outside(values, rule["short_hold"]))
+
+    rows = np.arange(count)
+    pos = next_entry[:, 0]
+    found = []
+    active = pos < length
+    while active.any():
+        pair = rows[active]
+        entry = pos[active]
+        is_long = long_in[pair, entry]
+        exit_ = np.where(is_long, next_long_out[pair, entry],
+                         next_short_out[pair, entry])
+        closed = exit_ < length
+        found.append((pair[closed], entry[closed], exit_[closed],
+                      is_long[closed]))
+        pos[active] = np.where(
+            closed, next_entry[pair, np.minimum(exit_ + 1, length)], length)
+        active = pos < length
+
+    if found:
+        pair, entry, exit_, is_long = [np.concatenate(part)
+                                       for part in zip(*found)]
+    else:
+        pair = entry = exit_ = np.empty(0, dtype=np.int64)
+        is_long = np.empty(0, dtype=bool)
+    order = np.lexsort((entry, pair))
+    return pair[order], entry[order], exit_[order], is_long[order]
+
+
+def pairs_per_batch(length, batch_size=None):
+    # pairs tested together for histories of length bars
+    batch_size = batch_size or config.BACKTEST_BATCH_SIZE
+    return max(1, min(batch_size, config.CHUNK_CELLS // max(length, 1)))
+
+
+def find_trades(values, x, y, rule):
+    # all closed trades, ordered by pair and entry bar
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    return _trade_table(*_walk(values, rule), x, y)
+
+
+def m1_rule(low, high):
+    # M1 bands: LONG inside [low, high] %, SHORT the mirrored band
+    return {"long_entry": (low, high), "short_entry": (100-high, 100-low),
+            "long_hold": (low, high), "short_hold": (100-high, 100-low)}
+
+
+def m2_rule(entry, exit_, stop):
+    # M2 bands of stock_back_test.py: entry beyond +-entry, exit back
+    # inside +-exit or beyond +-stop
+    return {"long_entry": (-np.inf, -entry), "short_entry": (entry, np.inf),
+            "long_hold": (-stop, -exit_), "short_hold": (exit_, stop)}
+
+
+def sweep_trades(values, x, y, rules, batch_rows=None):
+    # every rule on every pair: trades, efficiency (%) and total P/L as
+    # rules x pairs arrays; (rule, pair) rows are walked together, in
+    # batches of about batch_rows rows
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+    count, length = values.shape
+    batch_rows = min(batch_rows or config.SWEEP_BATCH_ROWS,
+                     config.CHUNK_CELLS // max(length, 1))
+    step = max(1, batch_rows // max(count, 1))
+
+    trades = np.zeros((len(rules), count), dtype=np.int64)
+    profit = np.zeros((len(rules), count), dtype=np.int64)
+    pnl = np.zeros((len(rules), count))
+    for start in range(0, len(rules), step):
+        batch = rules[start:start + step]
+        rule = {}
+        for key in ("long_entry", "short_entry", "long_hold", "short_hold"):
+            rule[key] = tuple(
+                np.repeat([band[key][k] for band in batch], count)[:, None]
+                for k in (0, 1))
+        row, entry, exit_, is_long = _walk(np.tile(values, (len(batch), 1)),
+                                           rule)
+        table = _trade_table(row % count, entry, exit_, is_long, x, y)
+
+        cells = len(batch) * count
+        measure = table["measure"]
+        trades[start:start + step] = np.bincount(
+            row, minlength=cells).reshape(len(batch), count)
+        profit[start:start + step] = np.bincount(
+            row[measure > 0], minlength=cells).reshape(len(batch), count)
+        pnl[start:start + step] = np.bincount(
+            row, weights=measure, minlength=cells).reshape(len(batch), count)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eff = np.where(trades > 0, 100*profit/trades, np.nan)
+    return {"trades": trades, "efficiency": eff, "pnl": pnl}
+
+
+def loop_trades(values, x, y, rule):
+    # per bar state machine of the original back test, single pair
+    long_entry = rule["long_entry"]
+    short_entry = rule["short_entry"]
+    long_hold = rule["long_hold"]
+    short_hold = rule["short_hold"]
+
+    trade_inprogress = 0
+    signal = ""
+    trade_start_idx = 0
+    trades = []
+    for i in range(len(values)):
+        value = values[i]
+        if trade_inprogress == 0:
+            if (value >= long_entry[0]) and (value <= long_entry[1]):
+                signal = "LONG"
+            elif (value >= short_entry[0]) and (value <= short_entry[1]):
+                signal = "SHORT"
+            else:
+                signal = "NOSIG"
+            trade_start_idx = i
+
+        if signal == "LONG":
+            trade_inprogress = 1
+            if (value < long_hold[0]) or (value > long_hold[1]):
+                trade_inprogress = 0
+                trades.append((trade_start_idx, i, True))
+        elif signal == "SHORT":
+            trade_inprogress = 1
+            if (value < short_hold[0]) or (value > short_hold[1]):
+                trade_inprogress = 0
+                trades.append((trade_start_idx, i, False))
+
+    table = {"pair": [], "entry": [], "exit": [], "long": [],
+             "measure": [], "x_qty": [], "y_qty": []}
+    for entry, exit_, is_long in trades:
+        x1 = x[entry]
+        y1 = y[entry]
+        x2 = x[exit_]
+        y2 = y[exit_]
+        X_qty, Y_qty = diophantine(x1, y1)
+        if is_long:
+            measure = (y2-y1)*Y_qty + (x1-x2)*X_qty
+        else:
+            measure = (y1-y2)*Y_qty + (x2-x1)*X_qty
+        for key, value in zip(("pair", "entry", "exit", "long", "measure",
+                               "x_qty", "y_qty"),
+                              (0, entry, exit_, is_long, measure,
+                               X_qty, Y_qty)):
+            table[key].append(value)
+    return table
+
+
+def efficiency(trades, count):
+    # % of profitable trades of every pair, NaN for pairs without trades
+    pair = np.asarray(trades["pair"], dtype=np.int64)
+    measure = np.asarray(trades["measure"], dtype=np.float64)
+    profit = np.bincount(pair[measure > 0], minlength=count)
+    total = np.bincount(pair, minlength=count)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total > 0, 100*profit/total, np.nan)
@@ -0,0 +1,341 @@
+#! /usr/bin/python3.8
+
+"""
+DoC - October, 18th Oct, 2026
+Description - Benchmark of the pair scan and back test on synthetic data
+Inputs by User - universe size, length and share of cointegrated pairs,
+see benchmark.py -h
+Outputs - time, pairs/sec and peak memory of every stage, JSON report
+Authors - L & JJ
+
+1. Universe from SyntheticProvider (synthetic_symbols), no network;
+   a share of the symbols come in cointegrated couples. It is written
+   once to price_cache and price_store in a temporary config.CACHE_DIR,
+   so load times the reads of the scripts (load_matrix, load_histories)
+2. Stages timed separately: load, align, regression, signals, adf,
+   backtest, write; every stage calls the functions of the scripts
+   (pair_scan.scan_inputs, chunk_signals, chunk_adf, chunk_rows and
+   stock_back_test.backtest_rows), config.HEDGE_MODE included; pairs/sec
+   is over the pairs a stage works on (all pairs for load to
+   regression, candidate pairs for signals, pairs fitted after that)
+3. Peak memory of a stage is the tracemalloc peak of the allocations
+   made in it (numpy arrays included); tracing slows down pure Python
+   code, --no-memory switches it off
+4. --legacy also times the per pair code paths the scripts used before
+   (sklearn/statsmodels fits, statsmodels adfuller, per bar scipy norm
+   and back test loops) on --legacy-pairs pairs, with the speedup of
+   the vectorized stage
+5. Baseline (default config.CACHE_DIR/benchmark_baseline.json) is
+   written with --save-baseline; later runs with the same parameters
+   report stages slower than baseline * (1 + --tolerance) and exit 1;
+   stages under MIN_SECONDS are not compared
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+import tempfile
+import warnings
+import tracemalloc
+import numpy as np
+
+import config
+import run_stats
+from price_provider import SyntheticProvider, synthetic_symbols
+from price_store import load_matrix, load_histories
+from align import fill_matrix
+from pair_stats import ols_both
+from pair_scan import scan_inputs, chunk_bounds, chunk_signals, chunk_adf, \
+    chunk_rows, RESULT_COLUMNS
+from stock_back_test import backtest_rows
+from backtest_engine import loop_trades, pairs_per_batch, m1_rule, m2_rule
+from results_sink import ResultSink
+
+
+# stages faster than this are not compared with the baseline (timer noise)
+MIN_SECONDS = 0.01
+
+STAGES = ("load", "align", "regression", "signals", "adf", "backtest",
+          "write")
+
+
+def default_baseline():
+    return os.path.join(config.CACHE_DIR, "benchmark_baseline.json")
+
+
+class StageTimer:
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.stages = {}
+
+    def run(self, name, pairs, func, *args):
+        if self.memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = func(*args)
+        seconds = time.perf_counter() - start
+        peak = 0
+        if self.memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        self.stages[name] = {
+            "seconds": seconds,
+            "pairs": pairs,
+            "pairs_per_sec": pairs / seconds if seconds > 0 else None,
+            "peak_mb": peak / 2**20 if self.memory else None,
+        }
+        return result
+
+
+def _load(names, provider):
+    # price matrix of the batch scan and histories of the back test, as
+    # the scripts load them
+    prices, dates, tz = load_matrix(names, provider)
+    histories = load_histories(names, provider)
+    return prices, histories
+
+
+def _signals(data, names):
+    # pair_scan.chunk_signals of every chunk of candidate pairs
+    return [chunk_signals(data, names, start, stop)
+            for start, stop in chunk_bounds(data)]
+
+
+def _adf(chunks):
+    for pending, fitted in chunks:
+        chunk_adf(pending, fitted)
+
+
+def _backtest(chunks, histories):
+    # stock_back_test on the pairs of the scan, per line of the results
+    # file as <Y>_<X>
+    pairs_arr = [pending[k][0][0].split("_")
+                 for pending, fitted in chunks for k in fitted]
+    step = pairs_per_batch(max([len(hist[1]) for hist in
+                                histories.values()] + [0]))
+    rows = []
+    # the script prints every pair
+    with open(os.devnull, "w") as fd, contextlib.redirect_stdout(fd):
+        for k in range(0, len(pairs_arr), step):
+            rows.extend(backtest_rows(pairs_arr[k:k + step], histories))
+    return rows
+
+
+def _write(directory, chunks):
+    sink = ResultSink("benchmark_result", RESULT_COLUMNS,
+                      directory=directory)
+    for pending, fitted in chunks:
+        for row, label, ok in chunk_rows(pending):
+            sink.write(row)
+    sink.close()
+
+
+def _legacy_regression(xs, ys):
+    from sklearn.linear_model import LinearRegression
+    import statsmodels.api as sm
+
+    for x, y in zip(xs, ys):
+        for a, b in ((x, y), (y, x)):
+            model = LinearRegression().fit(a.reshape(-1, 1), b)
+            residuals = b - model.predict(a.reshape(-1, 1))
+            np.std(residuals)
+            sm.OLS(b, sm.add_constant(a)).fit().bse[0]
+
+
+def _legacy_signals(xs, ys):
+    from scipy.stats import norm
+
+    for x, y in zip(xs, ys):
+        cp_ratio = []
+        for i in range(len(x)):
+            cp_ratio.append(y[i]/x[i])
+        norm(np.mean(cp_ratio), np.std(cp_ratio)).cdf(cp_ratio[-1])
+
+
+def _legacy_adf(residuals):
+    from statsmodels.tsa.stattools import adfuller
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        for resd in residuals:
+            try:
+                adfuller(resd, regression="n")
+            except ValueError:
+                # statsmodels before 0.12 calls it 'nc'
+                adfuller(resd, regression="nc")
+
+
+def _legacy_backtest(xs, ys):
+    from scipy.stats import norm
+
+    for x, y in zip(xs, ys):
+        cp_ratio = [float(y[i])/float(x[i]) for i in range(len(x))]
+        mu = np.mean(cp_ratio)
+        std = np.std(cp_ratio)
+        cdf = [norm(mu, std).cdf(ratio)*100 for ratio in cp_ratio]
+        fit = ols_both(x, y)[0]
+        loop_trades(cdf, x, y, m1_rule(0.3, 2.5))
+        loop_trades(fit[4] / fit[2], x, y, m2_rule(2.5, 2.0, 3.0))
+
+
+class StoredSynthetic(SyntheticProvider):
+    # synthetic histories kept in price_cache / price_store as downloads
+    # are, so load times the reads of the scripts
+    cacheable = True
+
+
+def run(symbols, length, coint_share, seed=0, min_corr=None,
+        legacy=False, legacy_pairs=50, memory=True):
+    timer = StageTimer(memory)
+    run_stats.reset()
+    names = synthetic_symbols(symbols, coint_share)
+    all_pairs = symbols * (symbols - 1) // 2
+    provider = StoredSynthetic(length=length, seed=seed)
+
+    cache_dir = config.CACHE_DIR
+    with tempfile.TemporaryDirectory() as directory:
+        config.CACHE_DIR = directory
+        try:
+            # cache and store filled once, load reads them back as the
+            # next run of a script does
+            load_matrix(names, provider)
+            prices, histories = timer.run("load", all_pairs, _load, names,
+                                          provider)
+            prices = timer.run("align", all_pairs, fill_matrix, prices)
+            data = timer.run("regression", all_pairs, scan_inputs, prices,
+                             min_corr)
+            pairs_i = data["pairs_i"]
+            chunks = timer.run("signals", len(pairs_i), _signals, data,
+                               names)
+            items = [pending[k] for pending, fitted in chunks
+                     for k in fitted]
+            count = len(items)
+            timer.run("adf", count, _adf, chunks)
+            timer.run("backtest", count, _backtest, chunks, histories)
+            timer.run("write", count, _write, directory, chunks)
+        finally:
+            config.CACHE_DIR = cache_dir
+    xs = [item[3] for item in items]
+    ys = [item[4] for item in items]
+    residuals = [item[1] for item in items]
+
+    if legacy:
+        sample = min(legacy_pairs, count)
+        for name, func, args in (
+                ("regression", _legacy_regression, (xs[:sample],
+                                                    ys[:sample])),
+                ("signals", _legacy_signals, (xs[:sample], ys[:sample])),
+                ("adf", _legacy_adf, (residuals[:sample],)),
+                ("backtest", _legacy_backtest, (xs[:sample], ys[:sample]))):
+            try:
+                timer.run(name + "_legacy", sample, func, *args)
+            except ImportError as exc:
+                print("Skipping legacy", name, ":", exc, file=sys.stderr)
+
+    params = {"symbols": symbols, "length": length,
+              "coint_share": coint_share, "seed": seed,
+              "min_corr": config.MIN_CORRELATION if min_corr is None
+              else min_corr,
+              "candidate_pairs": int(len(pairs_i))}
+    return {"params": params, "stages": timer.stages,
+            "total_seconds": sum(timer.stages[name]["seconds"]
+                                 for name in STAGES)}
+
+
+def compare(report, baseline, tolerance):
+    # stages slower than the baseline by more than tolerance
+    slower = []
+    if baseline is None or baseline["params"] != report["params"]:
+        return slower
+    for name, stage in report["stages"].items():
+        base = baseline["stages"].get(name)
+        if base and stage["seconds"] > MIN_SECONDS and \
+                stage["seconds"] > base["seconds"] * (1 + tolerance):
+            slower.append((name, base["seconds"], stage["seconds"]))
+    return slower
+
+
+def print_report(report):
+    print("%-20s %10s %10s %14s %10s" %
+          ("stage", "seconds", "pairs", "pairs/sec", "peak MB"))
+    stages = report["stages"]
+    for name, stage in stages.items():
+        rate = stage["pairs_per_sec"]
+        peak = stage["peak_mb"]
+        print("%-20s %10.4f %10d %14s %10s" %
+              (name, stage["seconds"], stage["pairs"],
+               "-" if rate is None else "%.1f" % rate,
+               "-" if peak is None else "%.1f" % peak))
+    for name in STAGES:
+        legacy = stages.get(name + "_legacy")
+        if legacy and legacy["pairs_per_sec"] and \
+                stages[name]["pairs_per_sec"]:
+            print("speedup %-12s %10.1fx" %
+                  (name, stages[name]["pairs_per_sec"] /
+                   legacy["pairs_per_sec"]))
+    print("total (vectorized stages) %.3f s" % report["total_seconds"])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="benchmark.py",
+        description="Benchmark of the pair scan stages on synthetic data")
+    parser.add_argument("--symbols", type=int, default=100)
+    parser.add_argument("--length", type=int, default=500,
+                        help="bars per symbol")
+    parser.add_argument("--coint-share", type=float, default=0.2,
+                        help="share of symbols in cointegrated couples")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-corr", type=float, default=None,
+                        help="price correlation filter, default config")
+    parser.add_argument("--legacy", action="store_true",
+                        help="also time the per pair code paths")
+    parser.add_argument("--legacy-pairs", type=int, default=50)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="do not trace memory (faster Python loops)")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", default=None,
+                        help="baseline file, default " + default_baseline())
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed slowdown against the baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args.symbols, args.length, args.coint_share, args.seed,
+                 args.min_corr, args.legacy, args.legacy_pairs,
+                 not args.no_memory)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as fd:
+            json.dump(report, fd, indent=2)
+
+    baseline_path = args.baseline or default_baseline()
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(baseline_path) or ".", exist_ok=True)
+        with open(baseline_path, "w") as fd:
+            json.dump(report, fd, indent=2)
+        print("Baseline saved to", baseline_path)
+        return
+
+    baseline = None
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as fd:
+            baseline = json.load(fd)
+    slower = compare(report, baseline, args.tolerance)
+    for name, before, now in slower:
+        print("SLOWER: %s %.4f s -> %.4f s" % (name, before, now))
+    if slower:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
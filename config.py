@@ -0,0 +1,164 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Common settings shared by the stock scripts
+Authors - L & JJ
+
+1. Every setting can be overridden with an environment variable of
+   the same name prefixed with STOCK_, e.g. STOCK_CACHE_DIR
+2. Paths default to the locations used so far by the scripts
+"""
+
+import os
+
+
+def _env(name, default):
+    return os.environ.get("STOCK_" + name, default)
+
+
+def _floats(name, default):
+    return [float(value) for value in _env(name, default).split(",")]
+
+
+# directory holding one cache file per symbol
+CACHE_DIR = _env("CACHE_DIR", os.path.expanduser("~/.stock_cache"))
+
+# cached data younger than this (seconds) is served without any request
+CACHE_MAX_AGE = float(_env("CACHE_MAX_AGE", 3600))
+
+# number of already cached bars fetched again to detect split/adjustment
+CACHE_OVERLAP = int(_env("CACHE_OVERLAP", 5))
+
+# relative tolerance for comparing overlapping bars
+CACHE_RTOL = float(_env("CACHE_RTOL", 1e-6))
+
+# length of history kept, in years
+HISTORY_YEARS = int(_env("HISTORY_YEARS", 2))
+
+# bar interval as in yfinance (1d, 1h, 15m, 5m, ...) and length of history
+# (<n>d, <n>wk, <n>mo, <n>y or max); yahoo keeps minute bars for the last
+# 60 days only, so intraday intervals default to 60d
+INTERVAL = _env("INTERVAL", "1d")
+LOOKBACK = _env("LOOKBACK", str(HISTORY_YEARS) + "y"
+                if INTERVAL in ("1d", "5d", "1wk", "1mo", "3mo") else "60d")
+
+# prices are stored (cache files, price matrix) in this dtype, arithmetic
+# is done in float64 on blocks of at most CHUNK_CELLS values
+PRICE_DTYPE = _env("PRICE_DTYPE", "float32")
+CHUNK_CELLS = int(_env("CHUNK_CELLS", 10000000))
+
+# memory-mapped price matrix in CACHE_DIR shared by the scripts
+# (price_store.py), 0 to build the matrix from the per symbol cache
+PRICE_STORE = _env("PRICE_STORE", "1") == "1"
+
+# source of price history: yahoo, replay or synthetic
+PROVIDER = _env("PROVIDER", "yahoo")
+
+# directory with recorded <symbol>.csv files for the replay provider
+REPLAY_DIR = _env("REPLAY_DIR", os.path.expanduser("~/.stock_replay"))
+
+# tickers requested together in one download
+BATCH_SIZE = int(_env("BATCH_SIZE", 50))
+
+# request budget for Yahoo, shared by all download threads
+RATE_LIMIT_PER_HOUR = float(_env("RATE_LIMIT_PER_HOUR", 2000))
+RATE_BURST = int(_env("RATE_BURST", 100))
+
+# concurrent download threads
+FETCH_WORKERS = int(_env("FETCH_WORKERS", 8))
+
+# retries of a throttled request, first wait in seconds (doubles each time)
+FETCH_RETRIES = int(_env("FETCH_RETRIES", 4))
+FETCH_BACKOFF = float(_env("FETCH_BACKOFF", 2.0))
+
+# pairs below these correlations (prices, daily log returns) are not
+# scanned, set to -1 to scan every pair
+MIN_CORRELATION = float(_env("MIN_CORRELATION", 0.7))
+MIN_RETURN_CORRELATION = float(_env("MIN_RETURN_CORRELATION", 0.0))
+
+# pairs whose residuals revert slower (half-life in bars) or have a
+# higher Hurst exponent are left out of the scan results, inf keeps all;
+# Hurst exponent from lags 2 .. HURST_MAX_LAG bars
+MAX_HALF_LIFE = float(_env("MAX_HALF_LIFE", "inf"))
+MAX_HURST = float(_env("MAX_HURST", "inf"))
+HURST_MAX_LAG = int(_env("HURST_MAX_LAG", 20))
+
+# rows of the correlation matrix computed at a time
+CORR_BLOCK_SIZE = int(_env("CORR_BLOCK_SIZE", 512))
+
+# pairs tested together by the batched ADF test
+ADF_BATCH_SIZE = int(_env("ADF_BATCH_SIZE", 2000))
+
+# hedge ratio of the M2 back test: static (one fit on the full history),
+# rolling (walk-forward fit on the last ROLLING_WINDOW bars) or kalman
+# (kalman_hedge.py)
+HEDGE_MODE = _env("HEDGE_MODE", "static")
+ROLLING_WINDOW = int(_env("ROLLING_WINDOW", 120))
+
+# Kalman filter: state random walk delta, observation noise variance and
+# bars without z-score at the start
+KALMAN_DELTA = float(_env("KALMAN_DELTA", 1e-4))
+KALMAN_VE = float(_env("KALMAN_VE", 1e-3))
+KALMAN_WARMUP = int(_env("KALMAN_WARMUP", 30))
+
+# pairs back tested together (stock_back_test.py)
+BACKTEST_BATCH_SIZE = int(_env("BACKTEST_BATCH_SIZE", 2000))
+
+# incremental daily scan (scan_state.py): relative move of slope or
+# residual std. dev. that triggers a new ADF test, and incremental runs
+# before the state is rebuilt from the full history
+INCREMENTAL = _env("INCREMENTAL", "0") == "1"
+ADF_REFRESH = float(_env("ADF_REFRESH", 0.01))
+STATE_REBUILD_RUNS = int(_env("STATE_REBUILD_RUNS", 20))
+
+# threshold grids of the back test sweep, comma separated: M1 band
+# [low, high] % (SHORT mirrored), M2 entry beyond +-entry and exit back
+# inside +-exit or beyond +-stop
+SWEEP_M1_LOW = _floats("SWEEP_M1_LOW", "0.1,0.3,0.5,1.0")
+SWEEP_M1_HIGH = _floats("SWEEP_M1_HIGH", "1.5,2.5,5.0,10.0")
+SWEEP_M2_ENTRY = _floats("SWEEP_M2_ENTRY", "1.5,2.0,2.5,3.0")
+SWEEP_M2_EXIT = _floats("SWEEP_M2_EXIT", "0.0,0.5,1.0,2.0")
+SWEEP_M2_STOP = _floats("SWEEP_M2_STOP", "3.0,4.0,inf")
+
+# (rule, pair) rows walked together by the threshold sweep
+SWEEP_BATCH_ROWS = int(_env("SWEEP_BATCH_ROWS", 5000))
+
+# staged screening of the batch scan (pair_screen.py): size of the top-K
+# shortlist (0 writes every pair), its score (zscore, half_life,
+# correlation, pvalue) and the limits of the stages; coverage is the
+# share of the bars of the price matrix common to both symbols, p-value
+# in %, half-life and Hurst limits are MAX_HALF_LIFE / MAX_HURST
+SCREEN_TOP_K = int(_env("SCREEN_TOP_K", 0))
+SCREEN_SCORE = _env("SCREEN_SCORE", "zscore")
+SCREEN_MIN_COVERAGE = float(_env("SCREEN_MIN_COVERAGE", 0.8))
+SCREEN_MIN_SLOPE = float(_env("SCREEN_MIN_SLOPE", 0.0))
+SCREEN_MAX_SLOPE = float(_env("SCREEN_MAX_SLOPE", "inf"))
+SCREEN_MIN_ZSCORE = float(_env("SCREEN_MIN_ZSCORE", 0.0))
+SCREEN_MAX_PVALUE = float(_env("SCREEN_MAX_PVALUE", 5.0))
+
+# processes used by the pair scan, 1 for a serial scan
+SCAN_WORKERS = int(_env("SCAN_WORKERS", os.cpu_count() or 1))
+
+# alignment of two histories: drop, ffill or max_gap (see align.py)
+ALIGN_POLICY = _env("ALIGN_POLICY", "drop")
+ALIGN_MAX_GAP = int(_env("ALIGN_MAX_GAP", 3))
+
+# pairs with fewer common bars are reported as errors
+MIN_COMMON_BARS = int(_env("MIN_COMMON_BARS", 30))
+
+# input files (list.csv, batch_result_filtered.csv) and results
+DATA_DIR = _env("DATA_DIR", "/home/euler/Documents/Projects/Stock")
+OUTPUT_DIR = _env("OUTPUT_DIR", DATA_DIR)
+
+# result file format (csv, parquet, arrow) and rows buffered per write
+RESULT_FORMAT = _env("RESULT_FORMAT", "csv")
+RESULT_BUFFER_ROWS = int(_env("RESULT_BUFFER_ROWS", 10000))
+
+# seconds between progress lines of the batch scan, 0 for none; the JSON
+# run report (run_stats.py) is written next to the results
+PROGRESS_INTERVAL = float(_env("PROGRESS_INTERVAL", 0))
+
+# seconds between price requests of the live signal monitor
+MONITOR_POLL = float(_env("MONITOR_POLL", 60))
+# longest wait between requests while the day has no bar yet (holiday,
+# before the open), the wait doubles from MONITOR_POLL up to this
+MONITOR_MAX_WAIT = float(_env("MONITOR_MAX_WAIT", 900))
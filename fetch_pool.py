@@ -0,0 +1,126 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Concurrent price downloads under a request budget
+Authors - L & JJ
+
+1. Symbols are split in batches of config.BATCH_SIZE and the batches are
+   downloaded by config.FETCH_WORKERS threads
+2. Every request takes a token from a token bucket shared by the whole
+   process, refilled at config.RATE_LIMIT_PER_HOUR (yfinance allows
+   about 2000 requests per hour before blocking the IP), with bursts up
+   to config.RATE_BURST requests; a batch larger than the burst waits
+   for its tokens in parts. The single ticker retries of YahooProvider
+   take a token each as well
+3. Throttled requests are retried with exponential backoff, other
+   errors are raised as before
+4. Every request is timed as run_stats stage download, throttled
+   attempts are counted (throttles)
+"""
+
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import run_stats
+
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity):
+        # rate in tokens per second
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        # more tokens than the bucket holds are taken in parts, so every
+        # request is paid for
+        while tokens > self.capacity:
+            self._take(self.capacity)
+            tokens -= self.capacity
+        self._take(tokens)
+
+    def _take(self, tokens):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now - self.stamp)*self.rate)
+                self.stamp = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens)/self.rate
+            time.sleep(wait)
+
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def default_bucket():
+    global _bucket
+    with _bucket_lock:
+        if _bucket is None:
+            _bucket = TokenBucket(config.RATE_LIMIT_PER_HOUR/3600.0,
+                                  config.RATE_BURST)
+    return _bucket
+
+
+def is_throttled(exc):
+    if type(exc).__name__ == "YFRateLimitError":
+        return True
+    text = str(exc)
+    return "Too Many Requests" in text or "429" in text or \
+        "Rate limited" in text
+
+
+def call_with_retry(func, tokens=1, bucket=None, retries=None,
+                    backoff=None):
+    bucket = bucket or default_bucket()
+    if retries is None:
+        retries = config.FETCH_RETRIES
+    if backoff is None:
+        backoff = config.FETCH_BACKOFF
+
+    attempt = 0
+    while True:
+        bucket.acquire(tokens)
+        try:
+            with run_stats.stage("download"):
+                return func()
+        except Exception as exc:
+            if not is_throttled(exc) or attempt >= retries:
+                raise
+            run_stats.count("throttles")
+            # exponential backoff with jitter so threads do not retry
+            # in lock step
+            delay = backoff * 2**attempt
+            time.sleep(delay + random.uniform(0, delay))
+            attempt += 1
+
+
+def fetch(provider, symbols, start=None, workers=None):
+    # same result as provider.fetch(symbols, start), downloaded concurrently
+    if not getattr(provider, "remote", False):
+        with run_stats.stage("download"):
+            return provider.fetch(symbols, start)
+
+    workers = workers or config.FETCH_WORKERS
+    batch_size = config.BATCH_SIZE
+    batches = [symbols[k:k + batch_size]
+               for k in range(0, len(symbols), batch_size)]
+
+    def fetch_batch(batch):
+        return call_with_retry(lambda: provider.fetch(batch, start),
+                               tokens=len(batch))
+
+    histories = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(fetch_batch, batches):
+            histories.update(result)
+    return histories
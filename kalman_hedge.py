@@ -0,0 +1,110 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Kalman filter estimate of the hedge ratio, bar by bar
+Authors - L & JJ
+
+1. State of every pair is (slope, intercept) of Y = slope*X + intercept,
+   a random walk with covariance delta/(1-delta) per bar
+   (config.KALMAN_DELTA); observation noise variance config.KALMAN_VE
+2. KalmanHedge keeps the state of many pairs as arrays, update() takes
+   the new X and Y bar of every pair: constant cost per bar, nothing is
+   refitted, so it works on live ticks as well as on full histories;
+   forecast() gives the z-score of an unfinished bar without the update
+3. Spread is the forecast error of Y before the update, the z-score is
+   the spread over its forecast std. dev.; usable as M2 std_err
+4. NaN bars leave the state of that pair unchanged; z-scores are NaN for
+   the first config.KALMAN_WARMUP bars of every pair
+5. kalman_filter runs the filter over a pairs x time matrix
+"""
+
+import numpy as np
+
+import config
+
+
+class KalmanHedge:
+
+    def __init__(self, count, delta=None, ve=None, warmup=None):
+        delta = config.KALMAN_DELTA if delta is None else delta
+        self.vw = delta / (1.0 - delta)
+        self.ve = config.KALMAN_VE if ve is None else ve
+        self.warmup = config.KALMAN_WARMUP if warmup is None else warmup
+
+        self.slope = np.zeros(count)
+        self.intercept = np.zeros(count)
+        # state covariance [[p00, p01], [p01, p11]]
+        self.p00 = np.zeros(count)
+        self.p01 = np.zeros(count)
+        self.p11 = np.zeros(count)
+        self.bars = np.zeros(count, dtype=np.int64)
+
+    def _predict(self, x, y, idx=slice(None)):
+        # prediction of the pairs idx, observation vector is (x, 1)
+        r00 = self.p00[idx] + self.vw
+        r01 = self.p01[idx]
+        r11 = self.p11[idx] + self.vw
+        spread = y - (self.slope[idx] * x + self.intercept[idx])
+        rx0 = r00 * x + r01
+        rx1 = r01 * x + r11
+        q = x * rx0 + rx1 + self.ve
+        return r00, r01, r11, spread, rx0, rx1, q
+
+    def forecast(self, x, y, idx=slice(None)):
+        # (spread, zscore) of a bar of the pairs idx that is not complete
+        # yet, the state is not updated
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        r00, r01, r11, spread, rx0, rx1, q = self._predict(x, y, idx)
+        with np.errstate(invalid="ignore"):
+            zscore = spread / np.sqrt(q)
+        hide = ~(np.isfinite(x) & np.isfinite(y)) | \
+            (self.bars[idx] < self.warmup)
+        return spread, np.where(hide, np.nan, zscore)
+
+    def update(self, x, y):
+        # new bar of every pair, returns (spread, zscore)
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        ok = np.isfinite(x) & np.isfinite(y)
+        x = np.where(ok, x, 0.0)
+        y = np.where(ok, y, 0.0)
+
+        r00, r01, r11, spread, rx0, rx1, q = self._predict(x, y)
+
+        # correction
+        k0 = rx0 / q
+        k1 = rx1 / q
+        self.slope = np.where(ok, self.slope + k0 * spread, self.slope)
+        self.intercept = np.where(ok, self.intercept + k1 * spread,
+                                  self.intercept)
+        self.p00 = np.where(ok, r00 - k0 * rx0, self.p00)
+        self.p01 = np.where(ok, r01 - k0 * rx1, self.p01)
+        self.p11 = np.where(ok, r11 - k1 * rx1, self.p11)
+        self.bars += ok
+
+        zscore = spread / np.sqrt(q)
+        hide = ~ok | (self.bars <= self.warmup)
+        spread = np.where(ok, spread, np.nan)
+        zscore = np.where(hide, np.nan, zscore)
+        return spread, zscore
+
+
+def kalman_filter(x, y, delta=None, ve=None, warmup=None):
+    # filter over a pair or a pairs x time matrix, returns slope and
+    # intercept after every bar, spread and z-score
+    shape = np.shape(x)
+    x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+    y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+
+    hedge = KalmanHedge(x.shape[0], delta, ve, warmup)
+    slope = np.empty(x.shape)
+    intercept = np.empty(x.shape)
+    spread = np.empty(x.shape)
+    zscore = np.empty(x.shape)
+    for t in range(x.shape[1]):
+        spread[:, t], zscore[:, t] = hedge.update(x[:, t], y[:, t])
+        slope[:, t] = hedge.slope
+        intercept[:, t] = hedge.intercept
+
+    return slope.reshape(shape), intercept.reshape(shape), \
+        spread.reshape(shape), zscore.reshape(shape)
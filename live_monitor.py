@@ -0,0 +1,361 @@
+#! /usr/bin/python3.8
+
+"""
+DoC - October, 18th Oct, 2026
+Description - Live M1/M2 signals of a watchlist of pairs
+Inputs by User - pairs file as written by the batch scan (Pairs column
+X_Y, e.g. batch_result_filtered.csv)
+Outputs - LONG / SHORT / EXIT transitions on the console and in
+live_signals_<date> in config.OUTPUT_DIR
+Authors - L & JJ
+
+1. Every pair is fitted once at start: slope, intercept and std. dev.
+   of residuals of Y on X (pair_stats.ols_both), mean and std. dev. of
+   the ratio Y/X, over the common bars of the history (align.py); the
+   M2 fit follows config.HEDGE_MODE: static over the whole history,
+   rolling over its last config.ROLLING_WINDOW bars, kalman runs the
+   filter (kalman_hedge.py) over the history but its last bar
+2. Last price of every symbol is kept in one array; a tick (new prices
+   of some symbols) recomputes the M2 std. error and the M1 cdf of the
+   pairs holding those symbols only, a few array operations whatever
+   the history length. Signal bands are the ones of the batch scan
+   (pair_scan.M1_signal / M2_signal). With kalman the z-score of a tick
+   is the forecast of the filter; a tick with a later time closes the
+   bar before it (at start the last bar of the history), the filter is
+   updated with the last prices of the pairs traded in that bar
+3. A change of signal is an event: LONG or SHORT on entry (or flip),
+   EXIT back to NOSIG. Events go through an asyncio.Queue to the writer,
+   so slow output never holds back the feed
+4. Feeds are async iterators of (time ns, symbol index, prices):
+   replay_feed plays the last bars of the history (fitted on the bars
+   before them), with an optional delay per bar, for testing without a
+   network; poll_feed asks the provider for today's bars every
+   config.MONITOR_POLL seconds (through fetch_pool, in a thread); while
+   the day has no bar yet it asks for one symbol only, waiting twice as
+   long every time, at most config.MONITOR_MAX_WAIT seconds
+5. Every tick is timed as run_stats stage tick, the number of ticks,
+   mean and max latency are printed at the end
+"""
+
+import os
+import sys
+import asyncio
+import datetime
+import numpy as np
+from scipy.special import ndtr
+
+import config
+import run_stats
+import fetch_pool
+import price_provider
+from price_store import load_histories
+from price_matrix import matrix_from_histories
+from align import align_pair
+from pair_stats import ols_both
+from kalman_hedge import KalmanHedge
+from backtest_engine import pad_rows
+from pair_scan import M1_signal, M2_signal
+from results_sink import ResultSink
+
+
+EVENT_COLUMNS = [("Time", "str"),
+                 ("Pairs", "str"),
+                 ("Method", "str"),
+                 ("Signal", "str"),
+                 ("Previous", "str"),
+                 ("Value", "float")]
+
+
+def read_pairs(fname):
+    # (X, Y) of every row of a pairs file
+    fd = open(fname, "r")
+    lines = fd.readlines()
+    fd.close()
+
+    pairs = []
+    for line in lines[1:]:
+        var = line.strip().split(",")
+        var1 = var[0].split("_")
+        if len(var1) == 2:
+            pairs.append((var1[0], var1[1]))
+    return pairs
+
+
+def fit_pairs(pairs, histories, end=None):
+    # fitted values of every pair over its common bars before end (ns),
+    # pairs with too few common bars are left out
+    symbols = sorted(set(symbol for pair in pairs for symbol in pair))
+    index = {symbol: k for k, symbol in enumerate(symbols)}
+    model = {"symbols": symbols, "names": [], "x_idx": [], "y_idx": [],
+             "slope": [], "intercept": [], "stdev_resd": [],
+             "ratio_mu": [], "ratio_std": [], "hedge": None}
+    xs = []
+    ys = []
+    for X, Y in pairs:
+        X_close, X_times, tz = histories[X]
+        Y_close, Y_times, tz = histories[Y]
+        times, x, y = align_pair(X_times, X_close, Y_times, Y_close)
+        if end is not None:
+            keep = times < end
+            x = x[keep]
+            y = y[keep]
+        x = x.astype(np.float64)
+        y = y.astype(np.float64)
+        if len(x) < config.MIN_COMMON_BARS:
+            print("ERROR: Too few common bars ", X, " & ", Y)
+            continue
+
+        if config.HEDGE_MODE == "rolling":
+            # fit of the last window, as rolling_ols at the last bar
+            slope, intercept, stdev_resd = ols_both(
+                x[-config.ROLLING_WINDOW:], y[-config.ROLLING_WINDOW:])[0][:3]
+        else:
+            slope, intercept, stdev_resd = ols_both(x, y)[0][:3]
+        ratio = y / x
+        model["names"].append(X + "_" + Y)
+        model["x_idx"].append(index[X])
+        model["y_idx"].append(index[Y])
+        model["slope"].append(slope)
+        model["intercept"].append(intercept)
+        model["stdev_resd"].append(stdev_resd)
+        model["ratio_mu"].append(ratio.mean())
+        model["ratio_std"].append(ratio.std())
+        xs.append(x)
+        ys.append(y)
+
+    for key in ("x_idx", "y_idx"):
+        model[key] = np.array(model[key], dtype=np.int64)
+    for key in ("slope", "intercept", "stdev_resd", "ratio_mu",
+                "ratio_std"):
+        model[key] = np.array(model[key], dtype=np.float64)
+
+    if config.HEDGE_MODE == "kalman":
+        # filter state before the last common bar of every pair, the bar
+        # the monitor starts in
+        model["hedge"] = KalmanHedge(len(xs))
+        x = pad_rows([x[:-1] for x in xs])
+        y = pad_rows([y[:-1] for y in ys])
+        for t in range(x.shape[1]):
+            model["hedge"].update(x[:, t], y[:, t])
+    elif config.HEDGE_MODE not in ("static", "rolling"):
+        raise ValueError("Unknown hedge mode: " + config.HEDGE_MODE)
+    return model
+
+
+class SignalMonitor:
+
+    def __init__(self, model, prices=None, time=None):
+        self.model = model
+        self.names = model["names"]
+        self.index = {symbol: k for k, symbol in enumerate(model["symbols"])}
+        self.prices = np.full(len(model["symbols"]), np.nan)
+        count = len(self.names)
+        self.m1 = np.full(count, "NOSIG", dtype="<U5")
+        self.m2 = np.full(count, "NOSIG", dtype="<U5")
+        self.cdf = np.full(count, np.nan)
+        self.std_err = np.full(count, np.nan)
+        # kalman: time of the bar of the last tick, pairs traded in it
+        self.hedge = model["hedge"]
+        self.bar_time = time
+        self.bar_pairs = np.zeros(count, dtype=bool)
+        if prices is not None:
+            # signals of the starting prices, not reported as events
+            self.update(None, np.arange(len(self.prices)), prices)
+
+    def update(self, time, idx, values):
+        # new prices of the symbols idx, returns the events
+        # (time, pair, method, signal, previous, value)
+        model = self.model
+        if self.hedge is not None and time is not None and \
+                (self.bar_time is None or time > self.bar_time):
+            if self.bar_time is not None:
+                self._close_bar()
+            self.bar_time = time
+        self.prices[idx] = values
+        touched = np.zeros(len(self.prices), dtype=bool)
+        touched[idx] = True
+        pairs = np.nonzero(touched[model["x_idx"]] |
+                           touched[model["y_idx"]])[0]
+
+        x = self.prices[model["x_idx"][pairs]]
+        y = self.prices[model["y_idx"][pairs]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if self.hedge is not None:
+                std_err = self.hedge.forecast(x, y, pairs)[1]
+                self.bar_pairs[pairs] = True
+            else:
+                std_err = (y - (model["intercept"][pairs] +
+                                model["slope"][pairs] * x)) / \
+                    model["stdev_resd"][pairs]
+            cdf = ndtr((y / x - model["ratio_mu"][pairs]) /
+                       model["ratio_std"][pairs])*100
+        self.std_err[pairs] = std_err
+        self.cdf[pairs] = cdf
+
+        events = []
+        for method, signals, new, values in (
+                ("M1", self.m1, M1_signal(cdf), cdf),
+                ("M2", self.m2, M2_signal(std_err), std_err)):
+            changed = np.nonzero(new != signals[pairs])[0]
+            for k in changed:
+                pair = pairs[k]
+                signal = "EXIT" if new[k] == "NOSIG" else str(new[k])
+                events.append((time, self.names[pair], method, signal,
+                               str(signals[pair]), float(values[k])))
+            signals[pairs[changed]] = new[changed]
+        return events
+
+    def _close_bar(self):
+        # the bar of the last tick is complete: Kalman update of the pairs
+        # traded in it, with their last prices
+        model = self.model
+        x = np.where(self.bar_pairs, self.prices[model["x_idx"]], np.nan)
+        y = np.where(self.bar_pairs, self.prices[model["y_idx"]], np.nan)
+        self.hedge.update(x, y)
+        self.bar_pairs[:] = False
+
+
+async def replay_feed(prices, dates, delay=0.0):
+    # one tick per bar of a symbols x dates matrix, symbols with a bar
+    for k in range(len(dates)):
+        column = prices[:, k]
+        idx = np.nonzero(np.isfinite(column))[0]
+        if len(idx):
+            yield int(dates[k]), idx, column[idx].astype(np.float64)
+        # lets the writer run between bars
+        await asyncio.sleep(delay)
+
+
+async def poll_feed(symbols, provider=None, interval=None):
+    # latest bar of every symbol, asked for every interval seconds; while
+    # the day has no bar only the first symbol is asked for, with a
+    # doubling wait up to config.MONITOR_MAX_WAIT
+    provider = provider or price_provider.get_provider()
+    interval = config.MONITOR_POLL if interval is None else interval
+    loop = asyncio.get_running_loop()
+    last = np.zeros(len(symbols), dtype=np.int64)
+    wait = interval
+    empty = False
+    while True:
+        start = str(datetime.date.today())
+        asked = list(symbols[:1]) if empty else list(symbols)
+        histories = await loop.run_in_executor(
+            None, fetch_pool.fetch, provider, asked, start)
+        empty = not any(len(histories.get(symbol, (None, [], ""))[1])
+                        for symbol in asked)
+        if empty:
+            # the empty batch falls back to one request per symbol
+            # (price_provider), so those are not repeated every poll
+            run_stats.count("empty_polls")
+            wait = min(wait * 2, max(config.MONITOR_MAX_WAIT, interval))
+            await asyncio.sleep(wait)
+            continue
+        wait = interval
+        if len(asked) < len(symbols):
+            # the day has started, every symbol at once
+            continue
+        idx = []
+        values = []
+        for k, symbol in enumerate(symbols):
+            close, times, tz = histories.get(symbol, (None, [], ""))
+            # unfinished bars change, so the last close is sent again
+            if len(times) and times[-1] >= last[k]:
+                last[k] = times[-1]
+                idx.append(k)
+                values.append(close[-1])
+        if idx:
+            yield int(last.max()), np.array(idx), np.array(values)
+        await asyncio.sleep(interval)
+
+
+async def watch(monitor, feed, events):
+    # every tick through the monitor, its events into the queue
+    async for time, idx, values in feed:
+        with run_stats.stage("tick"):
+            found = monitor.update(time, idx, values)
+        run_stats.count("ticks")
+        for event in found:
+            await events.put(event)
+    await events.put(None)
+
+
+async def write_events(events, sink, tz=""):
+    import pandas as pd
+
+    while True:
+        event = await events.get()
+        if event is None:
+            break
+        when = pd.Timestamp(event[0], unit="ns", tz="UTC")
+        if tz:
+            when = when.tz_convert(tz)
+        row = (str(when),) + event[1:]
+        print("%s %s %s: %s -> %s (%.4f)" % (row[0], row[1], row[2],
+                                             row[4], row[3], row[5]))
+        sink.write(row)
+        run_stats.count("events")
+
+
+async def run(monitor, feed, sink, tz=""):
+    events = asyncio.Queue()
+    await asyncio.gather(watch(monitor, feed, events),
+                         write_events(events, sink, tz))
+
+
+def main(fname=None, replay=None, delay=0.0, poll=None):
+
+    # reading symbol pairs from list file
+    if fname is None:
+        fname = os.path.join(config.DATA_DIR, "batch_result_filtered.csv")
+    pairs = read_pairs(fname)
+    run_stats.reset()
+
+    histories = load_histories(
+        sorted(set(symbol for pair in pairs for symbol in pair)))
+    symbols = sorted(histories)
+    prices, dates, tz = matrix_from_histories(symbols, histories)
+
+    if replay:
+        # fit on the bars before the replayed ones
+        start = max(len(dates) - replay, 0)
+        end = dates[start] if start < len(dates) else None
+        model = fit_pairs(pairs, histories, end)
+        feed_prices = prices[:, start:]
+        feed_dates = dates[start:]
+        prices = prices[:, :start]
+    else:
+        model = fit_pairs(pairs, histories)
+
+    # last price of every symbol before the feed starts, and its bar
+    last = np.full(len(symbols), np.nan)
+    last_time = None
+    for k in range(len(symbols)):
+        finite = np.nonzero(np.isfinite(prices[k]))[0]
+        if len(finite):
+            last[k] = prices[k, finite[-1]]
+            last_time = max(int(dates[finite[-1]]), last_time or 0)
+    monitor = SignalMonitor(model, last, last_time)
+    print(len(model["names"]), " pairs monitored")
+
+    if replay:
+        feed = replay_feed(feed_prices, feed_dates, delay)
+    else:
+        feed = poll_feed(symbols, interval=poll)
+
+    date_today = str(datetime.date.today())
+    sink = ResultSink("live_signals_" + date_today, EVENT_COLUMNS)
+    try:
+        asyncio.run(run(monitor, feed, sink, tz))
+    except KeyboardInterrupt:
+        pass
+    sink.close()
+
+    tick = run_stats.report()["stages"].get("tick")
+    if tick:
+        print("Ticks: %d, mean %.3f ms, max %.3f ms per tick" % (
+            tick["count"], tick["mean"]*1000, tick["max"]*1000),
+            file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Pair scan of the batch program, serial or on many cores
+Authors - L & JJ
+
+1. Candidate pairs are processed in chunks of config.ADF_BATCH_SIZE
+   (fewer for long histories, at most config.CHUNK_CELLS pair bars),
+   every chunk gives the result rows of stock-batch-1.py for its pairs
+   (columns in RESULT_COLUMNS)
+2. With config.SCAN_WORKERS > 1 chunks run in a process pool. The price
+   matrix and the all-pairs regression arrays are written once to
+   memory-mapped .npy files, workers map them read-only and only get
+   (start, stop) indices of the candidate pair arrays; a price matrix
+   mapped from price_store is not written, workers map the store file
+3. Chunks come back in order, so the output file is the same as with
+   a serial scan; scan_chunk runs the stages chunk_signals, chunk_adf
+   and chunk_rows, which benchmark.py times separately
+4. Every chunk is timed (run_stats stages signal and adf) and counts its
+   rejected pairs and alignment gaps; workers send their run_stats
+   snapshot back with the rows
+5. Half-life and Hurst exponent of the residuals are computed for the
+   whole chunk on one NaN padded residual matrix; pairs beyond
+   config.MAX_HALF_LIFE / config.MAX_HURST are dropped before the ADF
+   test and not written (counter reversion_rejects)
+6. M2 std. error of the last bar follows config.HEDGE_MODE (as the back
+   tests): static is the all-pairs regression, rolling and kalman are
+   run over the common bars of every pair (pair_stats.last_std_err)
+"""
+
+import os
+import mmap
+import time
+import shutil
+import tempfile
+import multiprocessing
+import numpy as np
+
+import config
+import run_stats
+from align import pair_rows
+from pair_stats import all_pairs_regression, candidate_pairs, \
+    select_direction, last_ratio_cdf, last_std_err, half_life, hurst, \
+    reverting
+from adf_batch import adf_pvalues
+from backtest_engine import pad_rows
+
+
+def M1_signal(cdf):
+    # signal of every M1 cdf (pair_stats.ratio_cdf) value
+    cdf = np.asarray(cdf)
+    long_sig = (cdf >= 0.3) & (cdf <= 2.5)
+    short_sig = (cdf >= 97.5) & (cdf <= 99.7)
+    return np.where(long_sig, "LONG", np.where(short_sig, "SHORT", "NOSIG"))
+
+
+def M2_signal(std_err):
+    # signal of every M2 std. error value
+    std_err = np.asarray(std_err)
+    return np.where(std_err <= -2.5, "LONG",
+                    np.where(std_err >= 2.5, "SHORT", "NOSIG"))
+
+
+RESULT_COLUMNS = [("Pairs", "str"),
+                  ("M1-signal", "str"),
+                  ("Intercept", "float"),
+                  ("Slope", "float"),
+                  ("p-value", "float"),
+                  ("std_err", "float"),
+                  ("Correlation", "float"),
+                  ("M2-signal", "str"),
+                  ("Half-life", "float"),
+                  ("Hurst", "float")]
+
+
+def chunk_signals(data, symbols_arr, start, stop):
+    # everything before the ADF test for pairs start:stop: (row, residuals,
+    # label, x, y) of every pair in order (residuals None for ERROR rows,
+    # None for pairs left out by the reversion filter) and the positions
+    # of the pairs left for the ADF test
+    prices = data["prices"]
+    slope_arr = data["slope"]
+    intercept_arr = data["intercept"]
+    stdev_resd_arr = data["stdev_resd"]
+    err_ratio_arr = data["err_ratio"]
+
+    pending = []
+    signal_start = time.perf_counter()
+    for k in range(start, stop):
+        comb = (int(data["pairs_i"][k]), int(data["pairs_j"][k]),
+                data["pairs_corr"][k])
+        db_1 = symbols_arr[comb[0]]
+        db_2 = symbols_arr[comb[1]]
+        label = db_1 + " & " + db_2
+
+        # common bars of both symbols in the price matrix
+        rows = pair_rows(prices, comb[0], comb[1], count_gaps=True)
+        if rows is None:
+            run_stats.count("unequal_length_rejects")
+            pending.append(((db_1+"_"+db_2, "ERROR"), None, label))
+            continue
+        db1_data, db2_data = rows
+        datalen = len(db1_data)
+
+        # direction with the smaller error ratio
+        x_idx, y_idx = select_direction(err_ratio_arr, comb[0], comb[1])
+        m = slope_arr[x_idx, y_idx]
+        c = intercept_arr[x_idx, y_idx]
+        stdev_resd = stdev_resd_arr[x_idx, y_idx]
+        if x_idx == comb[0]:
+            x = db1_data
+            y = db2_data
+            pair_name = db_1+"_"+db_2
+        else:
+            x = db2_data
+            y = db1_data
+            pair_name = db_2+"_"+db_1
+        residuals = y - (c + m*x)
+
+        std_err = residuals[datalen-1]/stdev_resd
+        corr_per = comb[2]*100
+        m2_sig = M2_signal(std_err)
+
+        # M1 signal, p-value, half-life and Hurst exponent are filled in
+        # for the whole chunk
+        row = [pair_name, None, c, m, None, std_err, corr_per, m2_sig,
+               None, None]
+        pending.append((row, residuals, label, x, y))
+
+    fitted = [k for k, item in enumerate(pending) if item[1] is not None]
+
+    # M2 std. error of the last bar with the fit of config.HEDGE_MODE,
+    # the static one is the regression above
+    if config.HEDGE_MODE != "static" and fitted:
+        std_errs = last_std_err([pending[k][3] for k in fitted],
+                                [pending[k][4] for k in fitted])
+        for k, std_err in zip(fitted, std_errs):
+            pending[k][0][5] = std_err
+            pending[k][0][7] = M2_signal(std_err)
+
+    # half-life and Hurst exponent of all residuals of the chunk at once,
+    # pairs outside config.MAX_HALF_LIFE / MAX_HURST are left out
+    residual_matrix = pad_rows([pending[k][1] for k in fitted])
+    half_lives = half_life(residual_matrix)
+    hursts = hurst(residual_matrix)
+    keep = reverting(half_lives, hursts)
+    run_stats.count("reversion_rejects", len(keep) - keep.sum())
+    for n, k in enumerate(fitted):
+        pending[k][0][8] = half_lives[n]
+        pending[k][0][9] = hursts[n]
+        if not keep[n]:
+            pending[k] = None
+    fitted = [k for k, ok in zip(fitted, keep) if ok]
+
+    # M1 cdf of the last bar, pairs of equal length together
+    m1_sig = M1_signal(last_ratio_cdf([pending[k][3] for k in fitted],
+                                      [pending[k][4] for k in fitted]))
+    for k, sig in zip(fitted, m1_sig):
+        pending[k][0][1] = sig
+    run_stats.add_time("signal", time.perf_counter() - signal_start)
+    run_stats.count("pairs", stop - start)
+    return pending, fitted
+
+
+def chunk_adf(pending, fitted):
+    # Augmented Dickey–Fuller test on residuals of the pairs fitted, the
+    # p-value (%) goes into their rows
+    with run_stats.stage("adf"):
+        p_values = adf_pvalues([pending[k][1] for k in fitted])*100
+    for k, p_value in zip(fitted, p_values):
+        pending[k][0][4] = p_value
+
+
+def chunk_rows(pending):
+    # (row, label, ok) of the pairs written
+    rows = []
+    for item in pending:
+        if item is None:
+            continue
+        row, residuals, label = item[:3]
+        rows.append((row, label, residuals is not None))
+    return rows
+
+
+def scan_chunk(data, symbols_arr, start, stop):
+    # result row, console label and success flag for pairs start:stop
+    pending, fitted = chunk_signals(data, symbols_arr, start, stop)
+    chunk_adf(pending, fitted)
+    return chunk_rows(pending)
+
+
+# arrays of the current worker process, mapped by _attach
+_worker_data = None
+_worker_symbols = None
+
+
+def _mapped_file(arr):
+    # (file, dtype, shape, order, offset) of an array that is a whole
+    # np.memmap (not a view of one), None otherwise
+    if isinstance(arr, np.memmap) and arr.filename and \
+            isinstance(arr.base, mmap.mmap):
+        order = "F" if arr.flags.f_contiguous and arr.ndim > 1 else "C"
+        return arr.filename, arr.dtype.str, arr.shape, order, arr.offset
+    return None
+
+
+def _attach(directory, names, mapped, symbols_arr):
+    global _worker_data, _worker_symbols
+    _worker_data = {}
+    for name in names:
+        if name in mapped:
+            fname, dtype, shape, order, offset = mapped[name]
+            _worker_data[name] = np.memmap(fname, dtype=dtype, mode="r",
+                                           shape=shape, order=order,
+                                           offset=offset)
+        else:
+            _worker_data[name] = np.load(
+                os.path.join(directory, name + ".npy"), mmap_mode="r")
+    _worker_symbols = symbols_arr
+
+
+def _scan_range(bounds):
+    # rows and the timings / counters of this chunk
+    run_stats.reset()
+    rows = scan_chunk(_worker_data, _worker_symbols, bounds[0], bounds[1])
+    return rows, run_stats.snapshot()
+
+
+def scan_inputs(prices, min_corr=None):
+    # candidate pairs and the all-pairs regression arrays of a price
+    # matrix, the data of scan
+    # pairs with low correlation are dropped before regression and ADF
+    with run_stats.stage("correlation"):
+        pairs_i, pairs_j, pairs_corr = candidate_pairs(prices, min_corr)
+
+    # linear regression of every pair in both directions at once
+    with run_stats.stage("regression"):
+        slope_arr, intercept_arr, stdev_resd_arr, intercept_stderr_arr, \
+            err_ratio_arr = all_pairs_regression(prices)
+
+    return {
+        "prices": prices,
+        "slope": slope_arr,
+        "intercept": intercept_arr,
+        "stdev_resd": stdev_resd_arr,
+        "err_ratio": err_ratio_arr,
+        "pairs_i": pairs_i,
+        "pairs_j": pairs_j,
+        "pairs_corr": pairs_corr,
+    }
+
+
+def chunk_bounds(data, chunk_size=None):
+    # (start, stop) of the chunks of candidate pairs
+    chunk_size = chunk_size or min(
+        config.ADF_BATCH_SIZE,
+        max(1, config.CHUNK_CELLS // max(data["prices"].shape[1], 1)))
+    total = len(data["pairs_i"])
+    return [(start, min(start + chunk_size, total))
+            for start in range(0, total, chunk_size)]
+
+
+def scan(data, symbols_arr, workers=None, chunk_size=None):
+    # yields the rows of every chunk, in pair order
+    workers = workers or config.SCAN_WORKERS
+    bounds = chunk_bounds(data, chunk_size)
+
+    if workers <= 1 or len(bounds) <= 1:
+        for start, stop in bounds:
+            yield scan_chunk(data, symbols_arr, start, stop)
+        return
+
+    # /dev/shm keeps the mapped files in memory where available
+    tmp_root = "/dev/shm" if os.path.isdir("/dev/shm") else None
+    directory = tempfile.mkdtemp(prefix="pair_scan_", dir=tmp_root)
+    try:
+        mapped = {}
+        for name, arr in data.items():
+            mapped_file = _mapped_file(arr)
+            if mapped_file is not None:
+                mapped[name] = mapped_file
+            else:
+                np.save(os.path.join(directory, name + ".npy"), arr)
+        with multiprocessing.Pool(
+                min(workers, len(bounds)), initializer=_attach,
+                initargs=(directory, list(data), mapped,
+                          symbols_arr)) as pool:
+            for rows, stats in pool.imap(_scan_range, bounds):
+                run_stats.merge(stats)
+                yield rows
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,242 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Staged screening of all pairs into a top-K shortlist
+Authors - L & JJ
+
+1. Candidate pairs come block by block from the correlation filter
+   (pair_stats.iter_candidate_pairs) and go through the stages in chunks
+   of config.ADF_BATCH_SIZE pairs (fewer for long histories), cheap
+   stages first, every stage only sees the pairs left by the one before:
+   correlation - price and return correlation thresholds (config.py),
+                 applied block by block before the chunks
+   coverage    - common bars at least config.SCREEN_MIN_COVERAGE of the
+                 bars of the matrix (and config.MIN_COMMON_BARS)
+   hedge       - slope (direction of the smaller error ratio) finite and
+                 inside [config.SCREEN_MIN_SLOPE, config.SCREEN_MAX_SLOPE],
+                 std. dev. of residuals above 0
+   half_life   - half-life of the residuals at most config.MAX_HALF_LIFE
+                 bars
+   hurst       - Hurst exponent of the residuals at most config.MAX_HURST
+   zscore      - |std. error| of the last bar (fit of
+                 config.HEDGE_MODE) at least config.SCREEN_MIN_ZSCORE
+   adf         - ADF p-value at most config.SCREEN_MAX_PVALUE (%)
+2. Pairs that pass go into a heap of the config.SCREEN_TOP_K best by
+   config.SCREEN_SCORE: zscore (|std. error|), half_life (shortest),
+   correlation or pvalue (smallest). Unless the score is the p-value,
+   the pairs of a chunk are ADF tested best first, max(K, ADF_STEP) at a
+   time, and once the heap is full pairs scoring below its minimum are
+   dropped untested (counted as pruned): the ADF time goes to pairs that
+   can still get in
+3. Memory holds one block of candidates, the price rows of one chunk and
+   the heap, not a row per pair nor symbols x symbols arrays: the hedge
+   ratio of a chunk is fitted from the row sums of its pairs only
+   (pair_stats.ols_rows); the chunks run serially since pruning follows
+   the heap
+4. Rejected pairs per stage are run_stats counters screen_<stage>
+   (screen_pruned for the pairs dropped before the ADF test)
+"""
+
+import time
+import heapq
+import numpy as np
+
+import config
+import run_stats
+from align import pair_matrix
+from pair_stats import ols_rows, iter_candidate_pairs, half_life, hurst, \
+    last_ratio_cdf, last_std_err
+from pair_scan import M1_signal, M2_signal, RESULT_COLUMNS
+from adf_batch import adf_pvalues
+
+
+SCREEN_COLUMNS = RESULT_COLUMNS + [("Score", "float")]
+
+SCORES = ("zscore", "half_life", "correlation", "pvalue")
+
+# fewest pairs per ADF call while filling the heap
+ADF_STEP = 64
+
+
+def pair_score(name, std_err, half_lives, corr, p_values=None):
+    # higher is better
+    if name == "zscore":
+        return np.abs(std_err)
+    elif name == "half_life":
+        return -half_lives
+    elif name == "correlation":
+        return corr
+    elif name == "pvalue":
+        return -p_values
+    else:
+        raise ValueError("Unknown screen score: " + name)
+
+
+def _reject(stage, keep):
+    # count the rejected pairs of a stage, index of the pairs left
+    run_stats.count("screen_" + stage, len(keep) - keep.sum())
+    return np.nonzero(keep)[0]
+
+
+def screen_chunk(data, symbols_arr, pairs_i, pairs_j, corr, heap, top_k,
+                 score_name, order=0):
+    # pairs of the chunk into the heap of (score, -position, row), order
+    # is the position of the first pair of the chunk in the scan
+    prices = data["prices"]
+    bars = prices.shape[1]
+
+    # coverage: common finite bars of both rows
+    position = order + np.arange(len(pairs_i))
+    counts = (np.isfinite(prices[pairs_i]) &
+              np.isfinite(prices[pairs_j])).sum(axis=1)
+    keep = _reject("coverage", counts >= max(config.MIN_COMMON_BARS,
+                                             config.SCREEN_MIN_COVERAGE *
+                                             bars))
+    pairs_i = pairs_i[keep]
+    pairs_j = pairs_j[keep]
+    corr = corr[keep]
+    position = position[keep]
+
+    # hedge ratio of the pairs of the chunk in both directions, the one
+    # with the smaller error ratio
+    with run_stats.stage("regression"):
+        x, y, counts = pair_matrix(prices, pairs_i, pairs_j)
+        fits = ols_rows(x, y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            err_ratio = [fit[3] / fit[2] for fit in fits]
+        swap = err_ratio[1] < err_ratio[0]
+        x_idx = np.where(swap, pairs_j, pairs_i)
+        y_idx = np.where(swap, pairs_i, pairs_j)
+        m, c, sd = [np.where(swap, fits[1][k], fits[0][k])
+                    for k in range(3)]
+        x, y = np.where(swap[:, None], y, x), np.where(swap[:, None], x, y)
+    with np.errstate(invalid="ignore"):
+        keep = _reject("hedge", np.isfinite(m) & np.isfinite(c) &
+                       (m >= config.SCREEN_MIN_SLOPE) &
+                       (m <= config.SCREEN_MAX_SLOPE) & (sd > 0))
+    x_idx, y_idx, m, c, sd, corr, position, counts = (
+        x_idx[keep], y_idx[keep], m[keep], c[keep], sd[keep], corr[keep],
+        position[keep], counts[keep])
+    x, y = x[keep], y[keep]
+
+    # residuals of the common bars, half-life, Hurst exponent and last
+    # std. error
+    signal_start = time.perf_counter()
+    residuals = y - (c[:, None] + m[:, None] * x)
+    half_lives = half_life(residuals)
+    keep = _reject("half_life", half_lives <= config.MAX_HALF_LIFE)
+    x_idx, y_idx, m, c, sd, corr, position, counts, half_lives = (
+        x_idx[keep], y_idx[keep], m[keep], c[keep], sd[keep], corr[keep],
+        position[keep], counts[keep], half_lives[keep])
+    x, y, residuals = x[keep], y[keep], residuals[keep]
+
+    hursts = hurst(residuals)
+    with np.errstate(invalid="ignore"):
+        keep = _reject("hurst", ~(hursts > config.MAX_HURST))
+    x_idx, y_idx, m, c, sd, corr, position, counts, half_lives, hursts = (
+        x_idx[keep], y_idx[keep], m[keep], c[keep], sd[keep], corr[keep],
+        position[keep], counts[keep], half_lives[keep], hursts[keep])
+    x, y, residuals = x[keep], y[keep], residuals[keep]
+
+    if config.HEDGE_MODE == "static":
+        std_err = residuals[np.arange(len(counts)), counts - 1] / sd
+    else:
+        std_err = last_std_err([x[k, :counts[k]] for k in range(len(x))],
+                               [y[k, :counts[k]] for k in range(len(y))])
+    keep = _reject("zscore", np.abs(std_err) >= config.SCREEN_MIN_ZSCORE)
+    run_stats.add_time("signal", time.perf_counter() - signal_start)
+    pairs = {"x_idx": x_idx, "y_idx": y_idx, "slope": m, "intercept": c,
+             "corr": corr, "position": position, "counts": counts,
+             "half_life": half_lives, "hurst": hursts, "std_err": std_err,
+             "x": x, "y": y, "residuals": residuals}
+
+    if score_name == "pvalue":
+        _adf_into_heap(pairs, keep, symbols_arr, heap, top_k, score_name)
+        return
+
+    # best first, the ADF test in steps; once the heap is full, the
+    # pairs below its minimum can never get in and are not tested
+    score = pair_score(score_name, std_err, half_lives, corr)
+    ranked = keep[np.argsort(-score[keep], kind="stable")]
+    step = max(top_k, ADF_STEP)
+    for k in range(0, len(ranked), step):
+        batch = ranked[k:k + step]
+        if len(heap) >= top_k:
+            live = batch[score[batch] > heap[0][0]]
+            if len(live) == 0:
+                # ranked best first, none of the rest can get in
+                run_stats.count("screen_pruned", len(ranked) - k)
+                break
+            run_stats.count("screen_pruned", len(batch) - len(live))
+            batch = live
+        _adf_into_heap(pairs, batch, symbols_arr, heap, top_k, score_name)
+
+
+def _adf_into_heap(pairs, batch, symbols_arr, heap, top_k, score_name):
+    # ADF test of the pairs batch, those that pass go into the heap
+    counts = pairs["counts"]
+    with run_stats.stage("adf"):
+        p_values = adf_pvalues([pairs["residuals"][k, :counts[k]]
+                                for k in batch])*100
+    keep = _reject("adf", p_values <= config.SCREEN_MAX_PVALUE)
+    batch = batch[keep]
+    p_values = p_values[keep]
+
+    std_err = pairs["std_err"][batch]
+    score = pair_score(score_name, std_err, pairs["half_life"][batch],
+                       pairs["corr"][batch], p_values)
+    m1_sig = M1_signal(last_ratio_cdf(
+        [pairs["x"][k, :counts[k]] for k in batch],
+        [pairs["y"][k, :counts[k]] for k in batch]))
+    m2_sig = M2_signal(std_err)
+    for n, k in enumerate(batch):
+        if not np.isfinite(score[n]):
+            continue
+        row = [symbols_arr[pairs["x_idx"][k]] + "_" +
+               symbols_arr[pairs["y_idx"][k]], m1_sig[n],
+               pairs["intercept"][k], pairs["slope"][k], p_values[n],
+               std_err[n], pairs["corr"][k]*100, m2_sig[n],
+               pairs["half_life"][k], pairs["hurst"][k], score[n]]
+        # equal scores keep the scan order
+        item = (score[n], -pairs["position"][k], row)
+        if len(heap) < top_k:
+            heapq.heappush(heap, item)
+        elif item[0] > heap[0][0]:
+            heapq.heapreplace(heap, item)
+
+
+def screen(symbols_arr, prices, top_k=None, score_name=None,
+           progress=None):
+    # rows of the top_k pairs, best first, and the number of candidates
+    top_k = top_k or config.SCREEN_TOP_K
+    score_name = score_name or config.SCREEN_SCORE
+    if score_name not in SCORES:
+        raise ValueError("Unknown screen score: " + score_name)
+
+    data = {"prices": prices}
+    chunk_size = min(config.ADF_BATCH_SIZE,
+                     max(1, config.CHUNK_CELLS // max(prices.shape[1], 1)))
+
+    heap = []
+    total = 0
+    order = 0
+    start = time.perf_counter()
+    for pairs_i, pairs_j, corr in iter_candidate_pairs(prices):
+        run_stats.add_time("correlation", time.perf_counter() - start)
+        total += len(pairs_i)
+        for k in range(0, len(pairs_i), chunk_size):
+            stop = k + chunk_size
+            screen_chunk(data, symbols_arr, pairs_i[k:stop],
+                         pairs_j[k:stop], corr[k:stop], heap, top_k,
+                         score_name, order)
+            done = len(pairs_i[k:stop])
+            order += done
+            run_stats.count("pairs", done)
+            if progress is not None:
+                progress.advance(done)
+        start = time.perf_counter()
+
+    count = len(symbols_arr)
+    run_stats.count("screen_correlation", count*(count-1)//2 - total)
+    print(total, " of ", count*(count-1)//2,
+          " pairs pass the correlation filter")
+    return [item[2] for item in sorted(heap, reverse=True)], total
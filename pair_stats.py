@@ -0,0 +1,466 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Regression statistics for all pairs of a price matrix at once
+Authors - L & JJ
+
+1. prices is a symbols x dates matrix, NaN/Inf bars are left out pair
+   by pair (only bars where both symbols are finite are used)
+2. Result arrays are symbols x symbols, element [i, j] is the regression
+   of row j (Y) on row i (X), i.e. both directions of every pair
+3. Same numbers as the sklearn LinearRegression + statsmodels OLS fits
+   in regression(): slope, intercept, std. dev. of residuals and
+   std. error of the intercept, from column sums and cross products
+4. Rows are centred on their own mean before the products to keep the
+   sums well conditioned
+5. ols_both does the same for a single pair (both directions, one pass
+   over a finite mask), replacing the sklearn/statsmodels fits; ols_rows
+   for the rows of pairs x bars matrices, when only some pairs are needed
+6. Correlation of prices and of daily log returns is computed in blocks
+   of rows (config.CORR_BLOCK_SIZE), candidate_pairs keeps the pairs
+   above config.MIN_CORRELATION / config.MIN_RETURN_CORRELATION so the
+   expensive stages skip the rest
+7. ratio_cdf is the M1 statistic: normal cdf (%) of the close price
+   ratio Y/X against the mean and std. dev. of the ratio, for a pair
+   or a pairs x time matrix, with one ndtr call (same values as
+   scipy.stats norm(mu, std).cdf)
+8. rolling_ols is the walk-forward version of the fit: window sums of
+   the centred series from running (cumulative) sums, so every bar is
+   an O(1) update and all pairs are done together; M2_std_err gives the
+   M2 std. error of every bar with the fit of config.HEDGE_MODE (static,
+   rolling or kalman), for the back test scripts, last_std_err the one
+   of the last bar for the scans
+9. The price matrix may be float32 and long (intraday bars): sums are
+   accumulated over blocks of bars (time_blocks), each converted to
+   float64, so at most config.CHUNK_CELLS values are converted at once
+10. iter_candidate_pairs gives the candidate pairs block by block, for
+    consumers that do not keep them all (pair_screen.py)
+11. half_life and hurst work on a pairs x bars residual matrix (NaN
+    padded), one AR(1) fit per row from masked row sums and one fit of
+    log std. dev. against log lag per row, all rows at once
+"""
+
+import numpy as np
+from scipy.special import ndtr
+
+import config
+from kalman_hedge import kalman_filter
+
+
+def time_blocks(prices, cells=None):
+    # float64 blocks of bars (columns) of a symbols x dates matrix, about
+    # config.CHUNK_CELLS values each
+    cells = cells or config.CHUNK_CELLS
+    bars = max(1, cells // max(prices.shape[0], 1))
+    # an empty history is one empty block
+    for start in range(0, max(prices.shape[1], 1), bars):
+        yield np.asarray(prices[:, start:start + bars], dtype=np.float64)
+
+
+def _row_shift(prices):
+    # mean of the finite bars of every row, 0 for empty rows
+    total = np.zeros(prices.shape[0])
+    counts = np.zeros(prices.shape[0])
+    for block in time_blocks(prices):
+        valid = np.isfinite(block)
+        total += np.where(valid, block, 0.0).sum(axis=1)
+        counts += valid.sum(axis=1)
+    shift = np.zeros(prices.shape[0])
+    has_data = counts > 0
+    shift[has_data] = total[has_data] / counts[has_data]
+    return shift
+
+
+def _centre(prices, shift=None):
+    # centre every row, shifts are added back to the intercepts
+    prices = np.asarray(prices, dtype=np.float64)
+    if shift is None:
+        shift = _row_shift(prices)
+    valid = np.isfinite(prices)
+    mask = valid.astype(np.float64)
+    data = np.where(valid, prices - shift[:, None], 0.0)
+
+    return data, mask, shift
+
+
+def _pair_sums(prices):
+    shift = _row_shift(prices)
+    count = prices.shape[0]
+    n = np.zeros((count, count))
+    sum_x = np.zeros((count, count))
+    sum_xx = np.zeros((count, count))
+    sum_xy = np.zeros((count, count))
+    for block in time_blocks(prices):
+        data, mask, _ = _centre(block, shift)
+        n += mask @ mask.T
+        sum_x += data @ mask.T
+        sum_xx += (data * data) @ mask.T
+        sum_xy += data @ data.T
+
+    return n, sum_x, sum_xx, sum_xy, shift
+
+
+def ols_moments(n, mean_x, mean_y, var_x, var_y, cov_xy):
+    # regression of Y on X from raw means and population (co)variances,
+    # works elementwise on arrays
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = cov_xy / var_x
+        intercept = mean_y - slope * mean_x
+
+        # population variance of residuals, as np.std(residuals)
+        resd_var = np.maximum(var_y - slope * cov_xy, 0.0)
+        stdev_resd = np.sqrt(resd_var)
+
+        # OLS standard error of the intercept, as statsmodels bse[0]
+        sigma2 = resd_var * n / (n - 2)
+        intercept_stderr = np.sqrt(
+            sigma2 * (1.0 / n + mean_x**2 / (n * var_x)))
+
+    return slope, intercept, stdev_resd, intercept_stderr
+
+
+def all_pairs_regression(prices):
+    return regression_from_sums(*_pair_sums(prices))
+
+
+def regression_from_sums(n, sum_x, sum_xx, sum_xy, shift):
+    # all_pairs_regression from the pair sums of rows centred on shift
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_x = sum_x / n
+        mean_y = mean_x.T
+        var_x = sum_xx / n - mean_x**2
+        var_y = var_x.T
+        cov_xy = sum_xy / n - mean_x * mean_y
+
+    slope, intercept, stdev_resd, intercept_stderr = ols_moments(
+        n, mean_x + shift[:, None], mean_y + shift[None, :],
+        var_x, var_y, cov_xy)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        err_ratio = intercept_stderr / stdev_resd
+
+    return slope, intercept, stdev_resd, intercept_stderr, err_ratio
+
+
+def ols_both(x, y):
+    # regression in both directions for one pair: (Y on X, X on Y),
+    # each as (slope, intercept, stdev_resd, intercept_stderr, residuals)
+    # only bars where both are finite are fitted, residuals are NaN on
+    # the other bars
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    mask = np.isfinite(x) & np.isfinite(y)
+    x_ok = x[mask]
+    y_ok = y[mask]
+    n = len(x_ok)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_x = x_ok.sum() / n
+        mean_y = y_ok.sum() / n
+        dx = x_ok - mean_x
+        dy = y_ok - mean_y
+        var_x = dx @ dx / n
+        var_y = dy @ dy / n
+        cov_xy = dx @ dy / n
+
+    fits = []
+    for a, b, stats in ((x, y, ols_moments(n, mean_x, mean_y,
+                                           var_x, var_y, cov_xy)),
+                        (y, x, ols_moments(n, mean_y, mean_x,
+                                           var_y, var_x, cov_xy))):
+        slope, intercept = stats[0], stats[1]
+        residuals = np.full(len(a), np.nan)
+        residuals[mask] = b[mask] - (intercept + slope * a[mask])
+        fits.append(stats + (residuals,))
+
+    return fits[0], fits[1]
+
+
+def ols_rows(x, y):
+    # ols_both for every row of pairs x bars matrices (NaN bars left
+    # out): (Y on X, X on Y), each as (slope, intercept, stdev_resd,
+    # intercept_stderr) arrays with one value per pair
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    mask = np.isfinite(x) & np.isfinite(y)
+    n = mask.sum(axis=-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_x = np.where(mask, x, 0.0).sum(axis=-1) / n
+        mean_y = np.where(mask, y, 0.0).sum(axis=-1) / n
+        dx = np.where(mask, x - mean_x[..., None], 0.0)
+        dy = np.where(mask, y - mean_y[..., None], 0.0)
+        var_x = (dx * dx).sum(axis=-1) / n
+        var_y = (dy * dy).sum(axis=-1) / n
+        cov_xy = (dx * dy).sum(axis=-1) / n
+
+    return ols_moments(n, mean_x, mean_y, var_x, var_y, cov_xy), \
+        ols_moments(n, mean_y, mean_x, var_y, var_x, cov_xy)
+
+
+def ratio_cdf(x, y):
+    # M1 cdf in % of every bar, along the last axis; NaN bars (padding)
+    # are left out of mean and std. dev.
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cp_ratio = y/x
+        if np.isnan(cp_ratio).any():
+            mu = np.nanmean(cp_ratio, axis=-1, keepdims=True)
+            std = np.nanstd(cp_ratio, axis=-1, keepdims=True)
+        else:
+            mu = np.mean(cp_ratio, axis=-1, keepdims=True)
+            std = np.std(cp_ratio, axis=-1, keepdims=True)
+        return ndtr((cp_ratio - mu)/std)*100
+
+
+def last_ratio_cdf(x_list, y_list):
+    # ratio_cdf of the last bar of pairs of any lengths, equal lengths
+    # are computed together
+    cdf = np.full(len(x_list), np.nan)
+    lengths = np.array([len(x) for x in x_list])
+    for length in np.unique(lengths):
+        rows = np.nonzero(lengths == length)[0]
+        x = np.stack([x_list[k] for k in rows])
+        y = np.stack([y_list[k] for k in rows])
+        cdf[rows] = ratio_cdf(x, y)[:, -1]
+    return cdf
+
+
+def _window_sum(values, window):
+    # sum of the last window values at every bar, from a running sum
+    total = np.cumsum(values, axis=-1)
+    total[..., window:] = total[..., window:] - total[..., :-window]
+    return total
+
+
+def rolling_ols(x, y, window):
+    # walk-forward regression of Y on X over the last window bars (the
+    # current bar included), for a pair or a pairs x time matrix;
+    # (slope, intercept, stdev_resd, residuals), NaN until the window is
+    # full of finite bars
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    valid = np.isfinite(x) & np.isfinite(y)
+    mask = valid.astype(np.float64)
+
+    # centre both series, as in _centre
+    counts = np.maximum(mask.sum(axis=-1, keepdims=True), 1.0)
+    shift_x = np.where(valid, x, 0.0).sum(axis=-1, keepdims=True) / counts
+    shift_y = np.where(valid, y, 0.0).sum(axis=-1, keepdims=True) / counts
+    dx = np.where(valid, x - shift_x, 0.0)
+    dy = np.where(valid, y - shift_y, 0.0)
+
+    n = _window_sum(mask, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_x = _window_sum(dx, window) / n
+        mean_y = _window_sum(dy, window) / n
+        var_x = _window_sum(dx * dx, window) / n - mean_x**2
+        var_y = _window_sum(dy * dy, window) / n - mean_y**2
+        cov_xy = _window_sum(dx * dy, window) / n - mean_x * mean_y
+
+    slope, intercept, stdev_resd, _ = ols_moments(
+        n, mean_x + shift_x, mean_y + shift_y, var_x, var_y, cov_xy)
+
+    full = valid & (n >= window)
+    slope = np.where(full, slope, np.nan)
+    intercept = np.where(full, intercept, np.nan)
+    stdev_resd = np.where(full, stdev_resd, np.nan)
+    residuals = y - (intercept + slope * x)
+
+    return slope, intercept, stdev_resd, residuals
+
+
+def M2_std_err(x, y):
+    # residuals of Y on X in units of their std. deviation, for a pair or
+    # a pairs x time matrix; config.HEDGE_MODE selects the fit
+    shape = np.shape(x)
+    if config.HEDGE_MODE == "rolling":
+        slope, intercept, stdev_resd, residuals = rolling_ols(
+            x, y, config.ROLLING_WINDOW)
+    elif config.HEDGE_MODE == "kalman":
+        slope, intercept, residuals, std_err = kalman_filter(x, y)
+        return std_err
+    elif config.HEDGE_MODE == "static":
+        # one fit per pair, all rows at once, NaN padding is left out
+        x = np.atleast_2d(np.asarray(x, dtype=np.float64))
+        y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+        slope, intercept, stdev_resd = ols_rows(x, y)[0][:3]
+        residuals = y - (intercept[:, None] + slope[:, None] * x)
+        stdev_resd = stdev_resd[:, None]
+    else:
+        raise ValueError("Unknown hedge mode: " + config.HEDGE_MODE)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std_err = residuals/stdev_resd
+
+    return std_err.reshape(shape)
+
+
+def last_std_err(x_list, y_list):
+    # M2_std_err of the last bar of pairs of any lengths, equal lengths
+    # are computed together
+    std_err = np.full(len(x_list), np.nan)
+    lengths = np.array([len(x) for x in x_list])
+    for length in np.unique(lengths):
+        rows = np.nonzero(lengths == length)[0]
+        x = np.stack([x_list[k] for k in rows])
+        y = np.stack([y_list[k] for k in rows])
+        std_err[rows] = M2_std_err(x, y)[:, -1]
+    return std_err
+
+
+def select_direction(err_ratio, i, j):
+    # X, Y rows for the pair, direction with the smaller error ratio
+    if err_ratio[j, i] < err_ratio[i, j]:
+        return j, i
+    return i, j
+
+
+def correlation_blocks(prices, block_size=None):
+    # yields (start, stop, corr) with corr the correlation of rows
+    # start:stop against all rows, so memory stays block_size x symbols
+    block_size = block_size or config.CORR_BLOCK_SIZE
+    shift = _row_shift(prices)
+
+    def centred():
+        for block in time_blocks(prices):
+            data, mask, _ = _centre(block, shift)
+            yield data, mask, data * data
+
+    # a history of one block is centred only once
+    blocks = None
+    if prices.shape[1] <= max(1, config.CHUNK_CELLS //
+                              max(prices.shape[0], 1)):
+        blocks = list(centred())
+
+    for start in range(0, prices.shape[0], block_size):
+        stop = min(start + block_size, prices.shape[0])
+        n = sum_x = sum_y = sum_xx = sum_yy = sum_xy = 0.0
+        for data, mask, data_sq in blocks or centred():
+            data_b = data[start:stop]
+            mask_b = mask[start:stop]
+
+            n = n + mask_b @ mask.T
+            sum_x = sum_x + data_b @ mask.T
+            sum_y = sum_y + mask_b @ data.T
+            sum_xx = sum_xx + (data_b * data_b) @ mask.T
+            sum_yy = sum_yy + mask_b @ data_sq.T
+            sum_xy = sum_xy + data_b @ data.T
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov_xy = sum_xy / n - sum_x * sum_y / n**2
+            var_x = sum_xx / n - (sum_x / n)**2
+            var_y = sum_yy / n - (sum_y / n)**2
+            corr = cov_xy / np.sqrt(var_x * var_y)
+
+        yield start, stop, corr
+
+
+def correlation_from_sums(n, sum_x, sum_xx, sum_xy):
+    # correlation of all pairs from the pair sums (see _pair_sums)
+    sum_y = sum_x.T
+    sum_yy = sum_xx.T
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov_xy = sum_xy / n - sum_x * sum_y / n**2
+        var_x = sum_xx / n - (sum_x / n)**2
+        var_y = sum_yy / n - (sum_y / n)**2
+        return cov_xy / np.sqrt(var_x * var_y)
+
+
+def log_returns(prices):
+    # computed in float64 blocks of rows, stored in the dtype of prices
+    count, length = prices.shape
+    returns = np.empty((count, max(length - 1, 0)), dtype=prices.dtype)
+    rows = max(1, config.CHUNK_CELLS // max(length, 1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for start in range(0, count, rows):
+            block = np.asarray(prices[start:start + rows], dtype=np.float64)
+            returns[start:start + rows] = np.diff(np.log(block), axis=1)
+    return returns
+
+
+def iter_candidate_pairs(prices, min_corr=None, min_ret_corr=None,
+                         block_size=None):
+    # yields (pairs_i, pairs_j, corr) of the pairs (i < j) passing both
+    # correlation thresholds, one block of rows at a time
+    if min_corr is None:
+        min_corr = config.MIN_CORRELATION
+    if min_ret_corr is None:
+        min_ret_corr = config.MIN_RETURN_CORRELATION
+
+    returns = log_returns(prices)
+
+    for (start, stop, corr), (_, _, ret_corr) in zip(
+            correlation_blocks(prices, block_size),
+            correlation_blocks(returns, block_size)):
+        keep = (corr >= min_corr) & (ret_corr >= min_ret_corr)
+        # upper triangle only, every pair once
+        keep &= np.arange(prices.shape[0])[None, :] > \
+            np.arange(start, stop)[:, None]
+        rows, cols = np.nonzero(keep)
+        yield rows + start, cols, corr[rows, cols]
+
+
+def candidate_pairs(prices, min_corr=None, min_ret_corr=None,
+                    block_size=None):
+    # pairs (i < j) passing both correlation thresholds, with their
+    # price correlation
+    pairs_i = []
+    pairs_j = []
+    pairs_corr = []
+    for rows, cols, corr in iter_candidate_pairs(prices, min_corr,
+                                                 min_ret_corr, block_size):
+        pairs_i.append(rows)
+        pairs_j.append(cols)
+        pairs_corr.append(corr)
+
+    if not pairs_i:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0)
+    return np.concatenate(pairs_i), np.concatenate(pairs_j), \
+        np.concatenate(pairs_corr)
+
+
+def half_life(residuals):
+    # mean reversion half-life in bars of every row of a pairs x bars
+    # residual matrix (NaN padded): AR(1) fit of the residual change on
+    # the previous residual, -ln 2 / slope; inf when not mean reverting
+    residuals = np.asarray(residuals, dtype=np.float64)
+    prev = residuals[:, :-1]
+    diff = residuals[:, 1:] - prev
+    valid = np.isfinite(prev) & np.isfinite(diff)
+    n = valid.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_prev = np.where(valid, prev, 0.0).sum(axis=1) / n
+        mean_diff = np.where(valid, diff, 0.0).sum(axis=1) / n
+        dx = np.where(valid, prev - mean_prev[:, None], 0.0)
+        dy = np.where(valid, diff - mean_diff[:, None], 0.0)
+        slope = (dx * dy).sum(axis=1) / (dx * dx).sum(axis=1)
+        return np.where(slope < 0, -np.log(2) / slope, np.inf)
+
+
+def hurst(residuals, max_lag=None):
+    # Hurst exponent of every row of a pairs x bars residual matrix (NaN
+    # padded): slope of log std. dev. of the lag differences against log
+    # lag, lags 2 .. max_lag; below 0.5 mean reverting, 0.5 random walk
+    max_lag = max_lag or config.HURST_MAX_LAG
+    residuals = np.asarray(residuals, dtype=np.float64)
+    lags = np.arange(2, max(max_lag, 3) + 1)
+    log_std = np.full((len(residuals), len(lags)), np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for k, lag in enumerate(lags[lags < residuals.shape[1]]):
+            diff = residuals[:, lag:] - residuals[:, :-lag]
+            valid = np.isfinite(diff)
+            n = valid.sum(axis=1)
+            mean = np.where(valid, diff, 0.0).sum(axis=1) / n
+            dev = np.where(valid, diff - mean[:, None], 0.0)
+            log_std[:, k] = 0.5 * np.log((dev * dev).sum(axis=1) / n)
+        log_lags = np.log(lags) - np.log(lags).mean()
+        return ((log_std - log_std.mean(axis=1, keepdims=True)) @
+                log_lags) / (log_lags @ log_lags)
+
+
+def reverting(half_lives, hursts):
+    # pairs within config.MAX_HALF_LIFE and config.MAX_HURST, NaN passes
+    with np.errstate(invalid="ignore"):
+        return ~(np.asarray(half_lives) > config.MAX_HALF_LIFE) & \
+            ~(np.asarray(hursts) > config.MAX_HURST)
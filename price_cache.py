@@ -0,0 +1,210 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Local per-symbol cache of close prices behind download_history
+Authors - L & JJ
+
+1. One file per symbol and bar interval in config.CACHE_DIR holding
+   close prices (config.PRICE_DTYPE, float32 by default), timestamps
+   (int64, ns since epoch, UTC) and the exchange time zone
+2. Only bars after the last cached date are downloaded. A few already
+   cached bars are fetched again; if they no longer match (stock split,
+   dividend adjustment) the full history is downloaded again
+3. Cache refreshed less than config.CACHE_MAX_AGE seconds ago is
+   served without any request
+4. History older than the lookback of the provider (config.LOOKBACK)
+   is dropped, so the cache returns the same window as a fresh download
+5. Prices come from a price_provider, symbols are requested in bulk
+   and concurrently (fetch_pool);
+   providers that serve local data (replay, synthetic) bypass the cache
+6. Scripts work on the close / int64 time arrays (update_histories);
+   download_history builds the list of Timestamps of the old interface
+"""
+
+import os
+import re
+import time
+import datetime
+import dateutil.relativedelta
+import numpy as np
+
+import config
+import fetch_pool
+import run_stats
+import price_provider
+
+
+def cache_name(name, interval=None):
+    # daily files keep their old names, other intervals get a suffix
+    interval = interval or config.INTERVAL
+    return name if interval == "1d" else name + "_" + interval
+
+
+def _cache_path(symbol, interval=None):
+    return os.path.join(config.CACHE_DIR,
+                        cache_name(symbol, interval) + ".npz")
+
+
+def lookback_cutoff(lookback=None):
+    # oldest bar (ns since epoch) kept for a lookback, None for max
+    lookback = lookback or config.LOOKBACK
+    if lookback == "max":
+        return None
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", lookback)
+    if match is None:
+        raise ValueError("Unknown lookback: " + lookback)
+    count = int(match.group(1))
+    unit = {"d": "days", "wk": "weeks", "mo": "months",
+            "y": "years"}[match.group(2)]
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - \
+        dateutil.relativedelta.relativedelta(**{unit: count})
+    return int(cutoff.timestamp()) * 10**9
+
+
+def _compact(close, times):
+    # storage types of a history
+    return np.asarray(close, dtype=config.PRICE_DTYPE), \
+        np.asarray(times, dtype=np.int64)
+
+
+def to_time_frame(times, tz):
+    # int64 nanoseconds back to the list of Timestamps the scripts use
+    import pandas as pd
+
+    index = pd.to_datetime(times, unit="ns", utc=True)
+    if tz:
+        index = index.tz_convert(tz)
+    return index.tolist()
+
+
+def load_cache(symbol, interval=None):
+    fname = _cache_path(symbol, interval)
+    if not os.path.exists(fname):
+        return None
+    with np.load(fname) as data:
+        close = data["close"]
+        times = data["time"]
+        tz = str(data["tz"])
+        fetched_at = float(data["fetched_at"])
+    return close, times, tz, fetched_at
+
+
+def save_cache(symbol, close, times, tz, interval=None):
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    fname = _cache_path(symbol, interval)
+    close, times = _compact(close, times)
+    # write to a temporary file first so an interrupted run never
+    # leaves a half written cache behind
+    tmp_name = fname + ".tmp"
+    with open(tmp_name, "wb") as fd:
+        np.savez(fd, close=close, time=times, tz=np.array(tz),
+                 fetched_at=np.array(time.time()))
+    os.replace(tmp_name, fname)
+
+
+def _trim(close, times, lookback=None):
+    # keep the same window a fresh download would return
+    cutoff_ns = lookback_cutoff(lookback)
+    if cutoff_ns is None:
+        return close, times
+    keep = times >= cutoff_ns
+    return close[keep], times[keep]
+
+
+def _merge(cached, fresh):
+    # returns merged close/time or None when the overlap does not match
+    old_close, old_times = cached
+    new_close, new_times = fresh
+
+    if len(new_times) == 0:
+        return old_close, old_times
+
+    # last cached bar may have been an unfinished session, leave it out
+    # of the comparison and let the fresh data replace it
+    common, old_idx, new_idx = np.intersect1d(
+        old_times[:-1], new_times, assume_unique=True, return_indices=True)
+    if len(common) == 0:
+        return None
+    if not np.allclose(old_close[old_idx], new_close[new_idx],
+                       rtol=config.CACHE_RTOL, equal_nan=True):
+        return None
+
+    keep = old_times < new_times[0]
+    close = np.concatenate((old_close[keep], new_close))
+    times = np.concatenate((old_times[keep], new_times))
+    return close, times
+
+
+def update_histories(symbols, provider=None):
+    provider = provider or price_provider.get_provider()
+    if not provider.cacheable:
+        fresh = fetch_pool.fetch(provider, symbols)
+        return {symbol: _compact(close, times) + (tz,)
+                for symbol, (close, times, tz) in fresh.items()}
+
+    interval = getattr(provider, "interval", None)
+    lookback = getattr(provider, "lookback", None)
+    histories = {}
+    full = []
+    incremental = {}
+    for symbol in symbols:
+        cached = load_cache(symbol, interval)
+        if cached is None:
+            full.append(symbol)
+            continue
+
+        close, times, tz, fetched_at = cached
+        if time.time() - fetched_at < config.CACHE_MAX_AGE:
+            histories[symbol] = (close, times, tz)
+        elif len(times) > config.CACHE_OVERLAP:
+            # re-download from the first overlapping bar onwards,
+            # symbols with the same start date share one request
+            start_ns = times[-config.CACHE_OVERLAP - 1]
+            start = to_time_frame([start_ns], tz)[0].strftime("%Y-%m-%d")
+            incremental.setdefault(start, []).append(symbol)
+        else:
+            full.append(symbol)
+
+    run_stats.count("cache_hits", len(histories))
+    run_stats.count("cache_updates",
+                    sum(len(batch) for batch in incremental.values()))
+    for start, batch in incremental.items():
+        fresh = fetch_pool.fetch(provider, batch, start)
+        for symbol in batch:
+            close, times, tz, fetched_at = load_cache(symbol, interval)
+            new_close, new_times, new_tz = fresh[symbol]
+            merged = _merge((close, times), (new_close, new_times))
+            if merged is None:
+                # adjusted prices, full download
+                full.append(symbol)
+                continue
+            close, times = _compact(*_trim(*merged, lookback))
+            tz = new_tz or tz
+            save_cache(symbol, close, times, tz, interval)
+            histories[symbol] = (close, times, tz)
+
+    if full:
+        run_stats.count("cache_misses", len(full))
+        fresh = fetch_pool.fetch(provider, full)
+        for symbol in full:
+            close, times = _compact(*fresh[symbol][:2])
+            tz = fresh[symbol][2]
+            save_cache(symbol, close, times, tz, interval)
+            histories[symbol] = (close, times, tz)
+
+    return histories
+
+
+def update_history(symbol, provider=None):
+    return update_histories([symbol], provider)[symbol]
+
+
+def download_history(db_name, provider=None, interval=None, lookback=None):
+    # bars of interval over lookback (config.INTERVAL / config.LOOKBACK
+    # unless given)
+    if provider is None:
+        provider = price_provider.get_provider(interval=interval,
+                                               lookback=lookback)
+    close_price, times, tz = update_history(db_name, provider)
+    time_frame = to_time_frame(times, tz)
+
+    return close_price, time_frame
@@ -0,0 +1,46 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Aligned in-memory price matrix for a list of symbols
+Authors - L & JJ
+
+1. Every symbol is loaded once (through price_cache), in bulk
+2. Rows are symbols, columns are the union of all bar timestamps,
+   NaN where a symbol has no bar for that timestamp
+3. Matrix is stored as config.PRICE_DTYPE (float32 by default), half
+   the memory of float64 for long intraday histories
+4. price_store.load_matrix gives the same matrix from the memory-mapped
+   store
+"""
+
+import numpy as np
+
+import config
+import price_cache
+
+
+def build_price_matrix(symbols, provider=None):
+    loaded = price_cache.update_histories(symbols, provider)
+    return matrix_from_histories(symbols, loaded)
+
+
+def matrix_from_histories(symbols, loaded):
+    # loaded: dict symbol -> (close, times, tz) of price_cache
+    histories = []
+    tz = ""
+    for symbol in symbols:
+        close, times, sym_tz = loaded[symbol]
+        histories.append((close, times))
+        tz = tz or sym_tz
+
+    if histories:
+        dates = np.unique(np.concatenate([h[1] for h in histories]))
+    else:
+        dates = np.empty(0, dtype=np.int64)
+
+    prices = np.full((len(symbols), len(dates)), np.nan,
+                     dtype=config.PRICE_DTYPE)
+    for k, (close, times) in enumerate(histories):
+        prices[k, np.searchsorted(dates, times)] = close
+
+    return prices, dates, tz
+
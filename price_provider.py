@@ -0,0 +1,259 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Sources of historical close prices
+Authors - L & JJ
+
+1. Every provider has fetch(symbols, start=None) returning a dict
+   symbol -> (close prices, timestamps in ns since epoch UTC, time zone)
+   start=None means the full config.LOOKBACK window
+2. YahooProvider - many tickers per request through yf.download, bars
+   of config.INTERVAL (daily or intraday, e.g. 5m, 15m)
+3. ReplayProvider - recorded histories, one <symbol>.csv per symbol
+   (Date,Close columns as written by save_replay or hist.to_csv),
+   no network required; a symbol without a file has an empty history
+4. SyntheticProvider - reproducible random walks, for benchmarks;
+   a symbol <leader>.C is cointegrated with <leader> (synthetic_symbols
+   makes universes with a given share of such couples); intraday
+   intervals give bars of a 09:15 - 15:30 session
+5. Provider used by the scripts is selected with config.PROVIDER
+6. Only YahooProvider results are cached locally (cacheable = True)
+   and rate limited (remote = True), see fetch_pool.py
+7. pandas and yfinance are imported on the first fetch, a run served
+   from the cache never loads them
+"""
+
+import os
+import zlib
+import numpy as np
+
+import config
+import fetch_pool
+import run_stats
+
+
+# suffix of synthetic symbols cointegrated with their leader
+COINT_SUFFIX = ".C"
+
+
+def _epoch_ns(index):
+    # DatetimeIndex to int64 nanoseconds, UTC
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return np.asarray(index, dtype="datetime64[ns]").astype(np.int64)
+
+
+def _from_frame(frame):
+    # NaN / Inf closes are left out here, counted as nan_stripped_bars
+    close = frame['Close']
+    finite = np.isfinite(close.to_numpy(dtype=np.float64))
+    run_stats.count("nan_stripped_bars", len(finite) - finite.sum())
+    close = close[finite]
+    tz = str(close.index.tz) if close.index.tz is not None else ""
+    return close.to_numpy(dtype=np.float64), _epoch_ns(close.index), tz
+
+
+def _empty():
+    return np.empty(0), np.empty(0, dtype=np.int64), ""
+
+
+class YahooProvider:
+    cacheable = True
+    remote = True
+
+    def __init__(self, suffix=".NS", batch_size=None, interval=None,
+                 lookback=None):
+        self.suffix = suffix
+        self.batch_size = batch_size or config.BATCH_SIZE
+        self.interval = interval or config.INTERVAL
+        self.lookback = lookback or config.LOOKBACK
+
+    def fetch(self, symbols, start=None):
+        histories = {}
+        for k in range(0, len(symbols), self.batch_size):
+            histories.update(self._fetch_batch(
+                symbols[k:k + self.batch_size], start))
+        return histories
+
+    def _fetch_batch(self, symbols, start):
+        import pandas as pd
+        import yfinance as yf
+
+        tickers = [symbol + self.suffix for symbol in symbols]
+        if start is None:
+            period = self.lookback
+        else:
+            period = None
+
+        # concurrency is handled by fetch_pool, one thread per batch
+        data = yf.download(tickers, start=start, period=period,
+                           interval=self.interval, group_by="ticker",
+                           auto_adjust=True, ignore_tz=False,
+                           threads=False, progress=False)
+
+        histories = {}
+        for symbol, ticker in zip(symbols, tickers):
+            if data is None or data.empty:
+                histories[symbol] = _empty()
+            elif isinstance(data.columns, pd.MultiIndex):
+                if ticker in data.columns.get_level_values(0):
+                    histories[symbol] = _from_frame(data[ticker])
+                else:
+                    histories[symbol] = _empty()
+            else:
+                histories[symbol] = _from_frame(data)
+
+            if len(histories[symbol][0]) == 0:
+                histories[symbol] = self._fetch_one(ticker, start, period)
+        return histories
+
+    def _fetch_one(self, ticker, start, period):
+        # yf.download hides errors, ask again for this ticker alone so a
+        # throttled request raises and can be retried by fetch_pool
+        import yfinance as yf
+
+        # one more request, paid from the same budget as the batches
+        fetch_pool.default_bucket().acquire(1)
+        stock = yf.Ticker(ticker)
+        try:
+            hist = stock.history(start=start, period=period,
+                                 interval=self.interval, auto_adjust=True,
+                                 raise_errors=True)
+        except Exception as exc:
+            if fetch_pool.is_throttled(exc):
+                raise
+            return _empty()
+        return _from_frame(hist)
+
+
+class ReplayProvider:
+    cacheable = False
+    remote = False
+
+    def __init__(self, directory=None, tz="Asia/Kolkata"):
+        self.directory = directory or config.REPLAY_DIR
+        self.tz = tz
+
+    def fetch(self, symbols, start=None):
+        import pandas as pd
+
+        histories = {}
+        for symbol in symbols:
+            fname = os.path.join(self.directory, symbol + ".csv")
+            if not os.path.exists(fname):
+                # no recording, an empty history as for a failed download
+                histories[symbol] = _empty()
+                continue
+            frame = pd.read_csv(fname, index_col=0)
+            frame.index = pd.to_datetime(frame.index, utc=True)
+            close, times, tz = _from_frame(frame)
+            if start is not None:
+                keep = times >= pd.Timestamp(start, tz=self.tz).value
+                close = close[keep]
+                times = times[keep]
+            histories[symbol] = (close, times, self.tz)
+        return histories
+
+
+def save_replay(directory, symbol, close, times, tz=""):
+    # record a history in the format ReplayProvider reads
+    import pandas as pd
+
+    os.makedirs(directory, exist_ok=True)
+    index = pd.to_datetime(times, unit="ns", utc=True)
+    if tz:
+        index = index.tz_convert(tz)
+    frame = pd.DataFrame({"Close": close}, index=index)
+    frame.index.name = "Date"
+    frame.to_csv(os.path.join(directory, symbol + ".csv"))
+
+
+class SyntheticProvider:
+    cacheable = False
+    remote = False
+
+    def __init__(self, length=500, seed=0, start="2019-01-01",
+                 interval=None):
+        self.length = length
+        self.seed = seed
+        self.start = start
+        self.interval = interval or config.INTERVAL
+
+    def _times(self):
+        # business days, or bars of the trading session for intraday
+        import pandas as pd
+
+        minutes = interval_minutes(self.interval)
+        if minutes is None:
+            index = pd.bdate_range(self.start, periods=self.length,
+                                   tz="Asia/Kolkata")
+            return _epoch_ns(index)
+        per_day = max(1, 375 // minutes)
+        days = pd.bdate_range(self.start, periods=-(-self.length // per_day),
+                              tz="Asia/Kolkata")
+        opening = _epoch_ns(days) + (9*60 + 15) * 60 * 10**9
+        offsets = np.arange(per_day, dtype=np.int64) * minutes * 60 * 10**9
+        return (opening[:, None] + offsets[None, :]).ravel()[:self.length]
+
+    def _random_walk(self, symbol):
+        # seed from the symbol so every run sees the same series
+        rng = np.random.default_rng([self.seed, zlib.crc32(symbol.encode())])
+        steps = rng.normal(0.0005, 0.015, self.length)
+        return 100.0 * np.exp(np.cumsum(steps))
+
+    def _close(self, symbol):
+        if not symbol.endswith(COINT_SUFFIX):
+            return self._random_walk(symbol)
+
+        # <leader>.C: hedge ratio times the leader plus an AR(1) spread
+        from scipy.signal import lfilter
+
+        leader = self._random_walk(symbol[:-len(COINT_SUFFIX)])
+        rng = np.random.default_rng(
+            [self.seed, zlib.crc32(symbol.encode())])
+        beta = rng.uniform(0.5, 2.0)
+        spread = lfilter([1.0], [1.0, -0.7],
+                         rng.normal(0.0, 0.005 * leader.mean(), self.length))
+        return beta * leader + 10.0 + spread
+
+    def fetch(self, symbols, start=None):
+        import pandas as pd
+
+        times = self._times()
+
+        histories = {}
+        for symbol in symbols:
+            close = self._close(symbol)
+            keep = np.ones(self.length, dtype=bool)
+            if start is not None:
+                keep = times >= pd.Timestamp(start, tz="Asia/Kolkata").value
+            histories[symbol] = (close[keep], times[keep], "Asia/Kolkata")
+        return histories
+
+
+def synthetic_symbols(count, coint_share=0.0):
+    # symbol names for SyntheticProvider, coint_share of them come in
+    # cointegrated couples (S00001, S00001.C)
+    couples = int(round(coint_share * count / 2))
+    leaders = ["S%05d" % k for k in range(count - couples)]
+    return leaders + [leaders[k] + COINT_SUFFIX for k in range(couples)]
+
+
+def interval_minutes(interval):
+    # length of an intraday bar in minutes, None for daily and longer
+    if interval.endswith("m") and not interval.endswith("mo"):
+        return int(interval[:-1])
+    if interval.endswith("h"):
+        return int(interval[:-1]) * 60
+    return None
+
+
+def get_provider(name=None, interval=None, lookback=None):
+    name = name or config.PROVIDER
+    if name == "yahoo":
+        return YahooProvider(interval=interval, lookback=lookback)
+    elif name == "replay":
+        return ReplayProvider()
+    elif name == "synthetic":
+        return SyntheticProvider(interval=interval)
+    else:
+        raise ValueError("Unknown price provider: " + name)
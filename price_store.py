@@ -0,0 +1,257 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Memory-mapped price matrix shared by the scripts
+Authors - L & JJ
+
+1. Store directory config.CACHE_DIR/store (store_<interval> for other
+   bar intervals) holds
+   prices-<id>.dat - symbols x dates matrix, config.PRICE_DTYPE, column
+                     major: the bars of one date are contiguous
+   dates-<id>.dat  - int64 timestamps (ns since epoch, UTC)
+   meta.json       - symbols, dtype, number of dates, time zone, data
+                     file names and the time of the last refresh
+2. Files are opened with np.memmap, read-only: every script and every
+   scan worker maps the same pages; a row (symbol) is a view of the map,
+   nothing is parsed or copied until it is used
+3. Refresh goes through price_cache (per symbol files, downloads), then
+   new dates are appended at the end of both files and changed last
+   bars (unfinished session) are written over in place; dates that left
+   the lookback window stay in the files, meta.json only moves the
+   first date of the window (maps start at that offset). Split or
+   dividend adjustments further back, new symbols, or a window start
+   past half of the files rebuild the store into new data files
+4. meta.json is replaced last (atomic), so readers see either the old or
+   the new store; maps opened before a rebuild stay valid
+5. A store refreshed less than config.CACHE_MAX_AGE seconds ago is used
+   without looking at the per symbol cache at all
+6. Used when config.PRICE_STORE is set and the provider is cacheable,
+   otherwise load_matrix / load_histories fall back to price_matrix /
+   price_cache. load_matrix (batch scan) refreshes the store,
+   load_histories (back tests, analysis of a pair) reads it while it is
+   fresh and otherwise goes to price_cache for just its symbols
+"""
+
+import os
+import json
+import time
+import numpy as np
+
+import config
+import price_cache
+import price_provider
+from price_matrix import build_price_matrix, matrix_from_histories
+
+
+def store_dir(interval=None):
+    return os.path.join(config.CACHE_DIR,
+                        price_cache.cache_name("store", interval))
+
+
+class PriceStore:
+
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+        self.symbols = list(meta["symbols"])
+        self.index = {symbol: k for k, symbol in enumerate(self.symbols)}
+        self.tz = meta["tz"]
+        self.fetched_at = meta["fetched_at"]
+
+        # dates start:count of the files are the current window
+        start = meta["start"]
+        count = meta["count"] - start
+        if count == 0 or not self.symbols:
+            self.dates = np.empty(0, dtype=np.int64)
+            self.prices = np.empty((len(self.symbols), count),
+                                   dtype=meta["dtype"])
+            return
+        itemsize = np.dtype(meta["dtype"]).itemsize
+        self.dates = np.memmap(os.path.join(directory, meta["dates"]),
+                               dtype=np.int64, mode="r", shape=(count,),
+                               offset=start * 8)
+        self.prices = np.memmap(os.path.join(directory, meta["prices"]),
+                                dtype=meta["dtype"], mode="r",
+                                shape=(len(self.symbols), count), order="F",
+                                offset=start * len(self.symbols) * itemsize)
+
+    def fresh(self):
+        return time.time() - self.fetched_at < config.CACHE_MAX_AGE
+
+    def row(self, symbol):
+        # all dates of one symbol, a view of the map (NaN where no bar)
+        return self.prices[self.index[symbol]]
+
+    def history(self, symbol):
+        # (close, times, tz) as price_cache returns it, bars of the symbol
+        # only; views of the map when the symbol has every date
+        close = self.row(symbol)
+        finite = np.isfinite(close)
+        if finite.all():
+            return close, self.dates, self.tz
+        return close[finite], self.dates[finite], self.tz
+
+    def matrix(self, symbols):
+        # symbols x dates matrix as build_price_matrix builds it; the map
+        # itself when symbols are the stored symbols in order
+        symbols = list(symbols)
+        if symbols == self.symbols:
+            return self.prices, self.dates
+        prices = self.prices[[self.index[symbol] for symbol in symbols]]
+        keep = np.isfinite(prices).any(axis=0)
+        if keep.all():
+            return prices, self.dates
+        return prices[:, keep], np.asarray(self.dates)[keep]
+
+
+def open_store(interval=None):
+    directory = store_dir(interval)
+    fname = os.path.join(directory, "meta.json")
+    if not os.path.exists(fname):
+        return None
+    with open(fname) as fd:
+        meta = json.load(fd)
+    if meta["dtype"] != np.dtype(config.PRICE_DTYPE).name:
+        return None
+    return PriceStore(directory, meta)
+
+
+def _write_meta(directory, meta):
+    fname = os.path.join(directory, "meta.json")
+    tmp_name = fname + ".tmp"
+    with open(tmp_name, "w") as fd:
+        json.dump(meta, fd)
+    os.replace(tmp_name, fname)
+
+
+def _remove_old(directory, meta):
+    # data files not named in meta (earlier versions of the store)
+    for name in os.listdir(directory):
+        if name.endswith(".dat") and \
+                name not in (meta["prices"], meta["dates"]):
+            os.remove(os.path.join(directory, name))
+
+
+def build_store(symbols, prices, dates, tz, interval=None):
+    # new data files for the whole matrix
+    directory = store_dir(interval)
+    os.makedirs(directory, exist_ok=True)
+    stamp = "%d" % time.time_ns()
+    meta = {"symbols": list(symbols),
+            "dtype": np.dtype(config.PRICE_DTYPE).name,
+            "start": 0, "count": len(dates), "tz": tz,
+            "prices": "prices-" + stamp + ".dat",
+            "dates": "dates-" + stamp + ".dat",
+            "fetched_at": time.time()}
+    # column major: the transposed matrix in C order
+    np.ascontiguousarray(np.asarray(prices, dtype=meta["dtype"]).T).tofile(
+        os.path.join(directory, meta["prices"]))
+    np.asarray(dates, dtype=np.int64).tofile(
+        os.path.join(directory, meta["dates"]))
+    _write_meta(directory, meta)
+    _remove_old(directory, meta)
+    return PriceStore(directory, meta)
+
+
+def _overlap(store, prices, dates):
+    # (drop, same): stored dates that left the window, new dates whose
+    # bars are unchanged; None when the new dates do not continue the
+    # stored ones
+    if len(dates) == 0:
+        return None
+    drop = int(np.searchsorted(store.dates, dates[0]))
+    overlap = len(store.dates) - drop
+    if overlap <= 0 or overlap > len(dates) or \
+            not np.array_equal(dates[:overlap], store.dates[drop:]):
+        return None
+    equal = np.isclose(prices[:, :overlap], store.prices[:, drop:],
+                       rtol=config.CACHE_RTOL, equal_nan=True).all(axis=0)
+    changed = np.nonzero(~equal)[0]
+    return drop, int(changed[0]) if len(changed) else overlap
+
+
+def append_store(store, prices, dates):
+    # writes the new matrix from its first changed date on at the end of
+    # the files; None when the store has to be rebuilt
+    found = _overlap(store, prices, dates)
+    if found is None:
+        return None
+    drop, same = found
+    overlap = len(store.dates) - drop
+    meta = dict(store.meta)
+    start = meta["start"] + drop
+    if same < overlap - config.CACHE_OVERLAP or \
+            start > (meta["count"] + len(dates) - overlap) // 2:
+        return None
+
+    # file position of the first changed date
+    first = start + same
+    itemsize = np.dtype(meta["dtype"]).itemsize
+    for name, data, width in (
+            (meta["prices"],
+             np.asarray(prices[:, same:], dtype=meta["dtype"]).T,
+             len(store.symbols) * itemsize),
+            (meta["dates"], np.asarray(dates[same:], dtype=np.int64), 8)):
+        with open(os.path.join(store.directory, name), "r+b") as fd:
+            fd.seek(first * width)
+            # not truncated, a reader may still map the old length
+            fd.write(np.ascontiguousarray(data).tobytes())
+    meta["start"] = start
+    meta["count"] = start + len(dates)
+    meta["fetched_at"] = time.time()
+    _write_meta(store.directory, meta)
+    return PriceStore(store.directory, meta)
+
+
+def load_store(symbols, provider=None):
+    # store holding at least symbols, refreshed if older than
+    # config.CACHE_MAX_AGE
+    provider = provider or price_provider.get_provider()
+    interval = getattr(provider, "interval", None)
+    store = open_store(interval)
+    if store is not None and store.fresh() and \
+            all(symbol in store.index for symbol in symbols):
+        return store
+
+    # stored symbols first, so the rows keep their order
+    stored = store.symbols if store is not None else []
+    all_symbols = stored + [symbol for symbol in dict.fromkeys(symbols)
+                            if symbol not in set(stored)]
+    histories = price_cache.update_histories(all_symbols, provider)
+    prices, dates, tz = matrix_from_histories(all_symbols, histories)
+
+    if store is not None and all_symbols == store.symbols and \
+            store.meta["count"] > 0:
+        updated = append_store(store, prices, dates)
+        if updated is not None:
+            return updated
+    return build_store(all_symbols, prices, dates, tz, interval)
+
+
+def _use_store(provider):
+    provider = provider or price_provider.get_provider()
+    return config.PRICE_STORE and provider.cacheable, provider
+
+
+def load_matrix(symbols, provider=None):
+    # (prices, dates, tz) of build_price_matrix, from the store
+    use, provider = _use_store(provider)
+    if not use:
+        return build_price_matrix(symbols, provider)
+    store = load_store(symbols, provider)
+    prices, dates = store.matrix(symbols)
+    return prices, dates, store.tz
+
+
+def load_histories(symbols, provider=None):
+    # dict symbol -> (close, times, tz) of price_cache.update_histories,
+    # from the store while it is fresh
+    use, provider = _use_store(provider)
+    store = open_store(getattr(provider, "interval", None)) if use else None
+    if store is None or not store.fresh() or \
+            not all(symbol in store.index for symbol in symbols):
+        return price_cache.update_histories(symbols, provider)
+    return {symbol: store.history(symbol) for symbol in symbols}
+
+
+def load_history(symbol, provider=None):
+    return load_histories([symbol], provider)[symbol]
@@ -0,0 +1,137 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Buffered writer for result tables (csv, parquet, arrow)
+Authors - L & JJ
+
+1. Rows are collected in one buffer per column and written in bulk every
+   config.RESULT_BUFFER_ROWS rows
+2. Columns are typed: (name, "str" | "float" | "int"), None is a missing
+   value, written as na_rep (per column) in csv and as null otherwise;
+   BLANK is missing as well but always an empty csv field (a value that
+   does not apply, e.g. efficiency of a pair without data)
+3. Format from config.RESULT_FORMAT: csv, parquet or arrow (Arrow IPC
+   file); parquet and arrow need the pyarrow package
+4. Files go to config.OUTPUT_DIR (or the directory given), the
+   extension follows the format
+5. Every flush is timed as run_stats stage write
+"""
+
+import os
+import csv
+
+import config
+import run_stats
+
+
+_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+
+# missing value written without na_rep
+BLANK = object()
+
+
+def result_path(name, fmt=None, directory=None):
+    # full path of a result file named name (without extension)
+    fmt = fmt or config.RESULT_FORMAT
+    return os.path.join(directory or config.OUTPUT_DIR,
+                        name + _EXTENSIONS[fmt])
+
+
+class ResultSink:
+
+    def __init__(self, name, columns, fmt=None, na_rep=None,
+                 buffer_rows=None, directory=None):
+        self.fmt = fmt or config.RESULT_FORMAT
+        if self.fmt not in _EXTENSIONS:
+            raise ValueError("Unknown result format: " + self.fmt)
+        self.path = result_path(name, self.fmt, directory)
+        self.names = [column[0] for column in columns]
+        self.types = [column[1] for column in columns]
+        self.na_rep = na_rep or {}
+        self.buffer_rows = buffer_rows or config.RESULT_BUFFER_ROWS
+        self.buffers = [[] for column in columns]
+        self.rows = 0
+        self.writer = None
+        self.fd = None
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if self.fmt == "csv":
+            self.fd = open(self.path, "w", newline="")
+            self.writer = csv.writer(self.fd, lineterminator="\n")
+            self.writer.writerow(self.names)
+        else:
+            self._open_arrow()
+
+    def _open_arrow(self):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("pyarrow is required for " + self.fmt +
+                              " results, install it or use csv")
+        arrow_types = {"str": pa.string(), "float": pa.float64(),
+                       "int": pa.int64()}
+        self.schema = pa.schema([(name, arrow_types[kind]) for name, kind
+                                 in zip(self.names, self.types)])
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            self.writer = pq.ParquetWriter(self.path, self.schema)
+        else:
+            self.fd = pa.OSFile(self.path, "wb")
+            self.writer = pa.ipc.new_file(self.fd, self.schema)
+
+    def write(self, row):
+        for buffer, value in zip(self.buffers, row):
+            buffer.append(value)
+        # short rows (e.g. errors) leave the remaining columns missing
+        for buffer in self.buffers[len(row):]:
+            buffer.append(None)
+        self.rows += 1
+        if self.rows >= self.buffer_rows:
+            self.flush()
+
+    def _typed(self, kind, values):
+        convert = {"str": str, "float": float, "int": int}[kind]
+        return [value if value is None or value is BLANK
+                else convert(value) for value in values]
+
+    def flush(self):
+        if self.rows == 0:
+            return
+        with run_stats.stage("write"):
+            self._write_buffers()
+
+    def _write_buffers(self):
+        columns = [self._typed(kind, values)
+                   for kind, values in zip(self.types, self.buffers)]
+
+        if self.fmt == "csv":
+            for k, name in enumerate(self.names):
+                rep = self.na_rep.get(name)
+                columns[k] = [rep if value is None else
+                              None if value is BLANK else value
+                              for value in columns[k]]
+            self.writer.writerows(zip(*columns))
+        else:
+            columns = [[None if value is BLANK else value
+                        for value in values] for values in columns]
+            import pyarrow as pa
+            table = pa.Table.from_arrays(
+                [pa.array(values, type=field.type)
+                 for values, field in zip(columns, self.schema)],
+                schema=self.schema)
+            self.writer.write_table(table)
+
+        self.buffers = [[] for name in self.names]
+        self.rows = 0
+
+    def close(self):
+        self.flush()
+        if self.fmt != "csv":
+            self.writer.close()
+        if self.fd is not None:
+            self.fd.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,176 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Stage timings, counters and progress of a batch run
+Authors - L & JJ
+
+1. One collector per process. stage(name) times a block into a
+   histogram of wall times (fixed bucket edges, HISTOGRAM_EDGES seconds)
+   with count, total, min and max; count(name) adds to a counter.
+   Both take a lock (download threads), cost is a few microseconds per
+   call, so they are used per batch / chunk, not per bar
+2. Stages of the batch scan: download (one fetch request), correlation,
+   regression, signal, adf (per chunk of pairs), write (results_sink
+   flush)
+3. Counters: cache_hits / cache_updates / cache_misses (price_cache),
+   throttles (fetch_pool retries), unequal_length_rejects (pairs with
+   too few common bars, see align.pair_rows), nan_stripped_bars (NaN /
+   Inf closes of downloaded or replayed histories, dropped in
+   price_provider before they reach the cache), alignment_gaps (dates
+   of the price matrix without a bar of both symbols, once per fitted
+   pair), pairs
+4. Worker processes of the pair scan send snapshot() back with every
+   chunk, merged into the collector of the main process
+5. report() gives a JSON ready dict, write_report() saves it; Progress
+   prints done/total, throughput and ETA on stderr, at most every
+   config.PROGRESS_INTERVAL seconds (0 switches it off)
+"""
+
+import sys
+import json
+import time
+import bisect
+import threading
+import contextlib
+
+import config
+
+
+HISTOGRAM_EDGES = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5,
+                   1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+# always in the report, zero when nothing happened
+COUNTERS = ("cache_hits", "cache_updates", "cache_misses", "throttles",
+            "unequal_length_rejects", "nan_stripped_bars", "alignment_gaps",
+            "pairs")
+
+_lock = threading.Lock()
+_stages = {}
+_counters = dict.fromkeys(COUNTERS, 0)
+
+
+def _empty_stage():
+    return {"count": 0, "total": 0.0, "min": None, "max": None,
+            "buckets": [0] * (len(HISTOGRAM_EDGES) + 1)}
+
+
+def reset():
+    global _stages, _counters
+    with _lock:
+        _stages = {}
+        _counters = dict.fromkeys(COUNTERS, 0)
+
+
+def add_time(name, seconds):
+    with _lock:
+        stage = _stages.get(name)
+        if stage is None:
+            stage = _stages[name] = _empty_stage()
+        stage["count"] += 1
+        stage["total"] += seconds
+        stage["min"] = seconds if stage["min"] is None \
+            else min(stage["min"], seconds)
+        stage["max"] = seconds if stage["max"] is None \
+            else max(stage["max"], seconds)
+        stage["buckets"][bisect.bisect_left(HISTOGRAM_EDGES, seconds)] += 1
+
+
+@contextlib.contextmanager
+def stage(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - start)
+
+
+def count(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + int(value)
+
+
+def snapshot():
+    with _lock:
+        return {"stages": {name: dict(stage, buckets=list(stage["buckets"]))
+                           for name, stage in _stages.items()},
+                "counters": dict(_counters)}
+
+
+def merge(other):
+    # add the snapshot of another process
+    with _lock:
+        for name, part in other["stages"].items():
+            stage = _stages.get(name)
+            if stage is None:
+                stage = _stages[name] = _empty_stage()
+            stage["count"] += part["count"]
+            stage["total"] += part["total"]
+            for key, pick in (("min", min), ("max", max)):
+                if part[key] is not None:
+                    stage[key] = part[key] if stage[key] is None \
+                        else pick(stage[key], part[key])
+            stage["buckets"] = [a + b for a, b in zip(stage["buckets"],
+                                                      part["buckets"])]
+        for name, value in other["counters"].items():
+            _counters[name] = _counters.get(name, 0) + value
+
+
+def report(**info):
+    # stages with mean and labelled buckets, counters and the given info
+    data = snapshot()
+    labels = ["<=%g" % edge for edge in HISTOGRAM_EDGES] + \
+        [">%g" % HISTOGRAM_EDGES[-1]]
+    stages = {}
+    for name, stage in data["stages"].items():
+        stages[name] = {
+            "count": stage["count"],
+            "total": stage["total"],
+            "mean": stage["total"] / stage["count"] if stage["count"]
+            else None,
+            "min": stage["min"],
+            "max": stage["max"],
+            "histogram": dict(zip(labels, stage["buckets"])),
+        }
+    result = dict(info)
+    result["stages"] = stages
+    result["counters"] = data["counters"]
+    return result
+
+
+def write_report(path, **info):
+    result = report(**info)
+    with open(path, "w") as fd:
+        json.dump(result, fd, indent=2)
+    return result
+
+
+class Progress:
+
+    def __init__(self, total=None, interval=None, unit="pairs"):
+        self.total = total
+        self.interval = config.PROGRESS_INTERVAL if interval is None \
+            else interval
+        self.unit = unit
+        self.done = 0
+        self.start = time.perf_counter()
+        self.last = self.start
+
+    def advance(self, done=1):
+        self.done += done
+        if self.interval <= 0:
+            return
+        now = time.perf_counter()
+        if now - self.last >= self.interval or self.done == self.total:
+            self.last = now
+            self.show(now)
+
+    def show(self, now=None):
+        now = now or time.perf_counter()
+        elapsed = now - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        line = "Progress: %d" % self.done
+        if self.total:
+            line += "/%d" % self.total
+        line += " %s, %.1f %s/s" % (self.unit, rate, self.unit)
+        if self.total and rate > 0:
+            line += ", ETA %.0f s" % ((self.total - self.done) / rate)
+        print(line, file=sys.stderr)
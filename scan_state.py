@@ -0,0 +1,326 @@
+"""
+DoC - October, 18th Oct, 2026
+Description - Persisted pair statistics for an incremental daily scan
+Authors - L & JJ
+
+1. State file (config.CACHE_DIR/scan_state.npz) holds the price window
+   of the last run and, for every pair, the sums behind the regression,
+   the correlation of prices and of log returns (as in pair_stats) and
+   the sums of the M1 ratio Y/X and its square
+2. A daily run compares the new price matrix with the stored window: the
+   bars that left the window are subtracted from the sums and the new
+   bars added, O(pairs x new bars) instead of the full history
+3. The state is rebuilt from scratch when the symbols change, the
+   stored bars no longer match (e.g. split adjustment), or after
+   config.STATE_REBUILD_RUNS incremental runs (bounds rounding drift)
+4. M1 and M2 signals of the last bar come from the sums (M2 with a
+   rolling or kalman config.HEDGE_MODE is run over the stored window of
+   every pair, as pair_scan); the ADF test
+   runs again only for pairs without a stored p-value or whose slope or
+   std. dev. of residuals moved more than config.ADF_REFRESH
+   (relative) since their last test; half-life and Hurst exponent of the
+   residuals are stored and refreshed with the p-value
+5. Sums are accumulated over float64 blocks of bars (time_blocks), the
+   state file is kept per bar interval
+6. daily_scan gives the same rows as pair_scan.scan, with the same
+   run_stats stages and counters (plus adf_tested)
+"""
+
+import os
+import time
+import numpy as np
+from scipy.special import ndtr
+
+import config
+import run_stats
+import price_cache
+from align import pair_rows
+from pair_stats import regression_from_sums, correlation_from_sums, \
+    log_returns, time_blocks, half_life, hurst, reverting, last_std_err
+from pair_scan import M1_signal, M2_signal
+from adf_batch import adf_pvalues
+from backtest_engine import pad_rows
+
+
+_SUM_KEYS = ("n", "sum_x", "sum_xx", "sum_xy")
+_RATIO_KEYS = ("ratio", "ratio_sq")
+_ADF_KEYS = ("adf_p", "adf_slope", "adf_stdev", "half_life", "hurst")
+
+
+def state_path():
+    return os.path.join(config.CACHE_DIR,
+                        price_cache.cache_name("scan_state") + ".npz")
+
+
+def load_state():
+    fname = state_path()
+    if not os.path.exists(fname):
+        return None
+    with np.load(fname) as data:
+        state = {key: data[key] for key in data.files}
+    state["symbols"] = [str(symbol) for symbol in state["symbols"]]
+    state["updates"] = int(state["updates"])
+    return state
+
+
+def save_state(state):
+    os.makedirs(config.CACHE_DIR, exist_ok=True)
+    fname = state_path()
+    # write to a temporary file first, as price_cache.save_cache
+    tmp_name = fname + ".tmp"
+    with open(tmp_name, "wb") as fd:
+        np.savez(fd, **state)
+    os.replace(tmp_name, fname)
+
+
+def _row_means(prices):
+    counts = np.zeros(prices.shape[0])
+    total = np.zeros(prices.shape[0])
+    for block in time_blocks(prices):
+        valid = np.isfinite(block)
+        counts += valid.sum(axis=1)
+        total += np.where(valid, block, 0.0).sum(axis=1)
+    return np.where(counts > 0, total / np.maximum(counts, 1), 0.0)
+
+
+def _column_sums(prices, shift):
+    # pair sums over the given bars, rows centred on shift
+    sums = {key: 0.0 for key in _SUM_KEYS}
+    for block in time_blocks(prices):
+        valid = np.isfinite(block)
+        mask = valid.astype(np.float64)
+        data = np.where(valid, block - shift[:, None], 0.0)
+        sums["n"] = sums["n"] + mask @ mask.T
+        sums["sum_x"] = sums["sum_x"] + data @ mask.T
+        sums["sum_xx"] = sums["sum_xx"] + (data * data) @ mask.T
+        sums["sum_xy"] = sums["sum_xy"] + data @ data.T
+    return sums
+
+
+def _ratio_sums(prices):
+    # [i, j] sums row j / row i and its square over common bars
+    sums = {key: 0.0 for key in _RATIO_KEYS}
+    for block in time_blocks(prices):
+        valid = np.isfinite(block)
+        with np.errstate(divide="ignore"):
+            inverse = np.where(valid, 1.0 / block, 0.0)
+        values = np.where(valid, block, 0.0)
+        sums["ratio"] = sums["ratio"] + inverse @ values.T
+        sums["ratio_sq"] = sums["ratio_sq"] + \
+            (inverse * inverse) @ (values * values).T
+    return sums
+
+
+def _add_bars(state, prices, returns, sign):
+    # add (sign 1) or remove (sign -1) bars and returns from the sums
+    for key, value in _column_sums(prices, state["shift"]).items():
+        state[key] = state[key] + sign * value
+    for key, value in _column_sums(returns, state["ret_shift"]).items():
+        state["ret_" + key] = state["ret_" + key] + sign * value
+    for key, value in _ratio_sums(prices).items():
+        state[key] = state[key] + sign * value
+
+
+def build_state(symbols, prices, dates):
+    count = len(symbols)
+    returns = log_returns(prices)
+    state = {"symbols": list(symbols), "dates": dates, "prices": prices,
+             "shift": _row_means(prices), "ret_shift": _row_means(returns),
+             "updates": 0}
+    for key in _SUM_KEYS:
+        state[key] = np.zeros((count, count))
+        state["ret_" + key] = np.zeros((count, count))
+    for key in _RATIO_KEYS:
+        state[key] = np.zeros((count, count))
+    _add_bars(state, prices, returns, 1)
+    for key in _ADF_KEYS:
+        state[key] = np.full((count, count), np.nan)
+    return state
+
+
+def update_state(state, symbols, prices, dates):
+    # state moved to the new window, None if it has to be rebuilt
+    if state is None or state["symbols"] != list(symbols):
+        return None
+    # state files of older versions lack some statistics
+    if any(key not in state for key in _ADF_KEYS):
+        return None
+    if state["updates"] >= config.STATE_REBUILD_RUNS:
+        return None
+
+    old_dates = state["dates"]
+    old_prices = state["prices"]
+    if len(dates) == 0 or len(old_dates) == 0:
+        return None
+    drop = int(np.searchsorted(old_dates, dates[0]))
+    overlap = len(old_dates) - drop
+    if overlap < 2 or overlap > len(dates):
+        return None
+    if not np.array_equal(old_dates[drop:], dates[:overlap]) or \
+            not np.array_equal(old_prices[:, drop:], prices[:, :overlap],
+                               equal_nan=True):
+        return None
+
+    state = dict(state)
+    if drop > 0:
+        gone = old_prices[:, :drop]
+        _add_bars(state, gone, log_returns(old_prices[:, :drop + 1]), -1)
+    if overlap < len(dates):
+        new = prices[:, overlap:]
+        _add_bars(state, new, log_returns(prices[:, overlap - 1:]), 1)
+    state["dates"] = dates
+    state["prices"] = prices
+    state["updates"] += 1
+    return state
+
+
+def _last_common(prices, x_idx, y_idx):
+    # last bar where both rows are finite, pairs are mostly done at once
+    length = prices.shape[1]
+    last = np.full(len(x_idx), length - 1)
+    missing = ~(np.isfinite(prices[x_idx, -1]) &
+                np.isfinite(prices[y_idx, -1]))
+    for k in np.nonzero(missing)[0]:
+        common = np.nonzero(np.isfinite(prices[x_idx[k]]) &
+                            np.isfinite(prices[y_idx[k]]))[0]
+        last[k] = common[-1] if len(common) else 0
+    return last
+
+
+def _hedge_std_err(prices, x_idx, y_idx):
+    # M2 std. error of the last bar with the fit of config.HEDGE_MODE,
+    # over the common bars of every pair
+    std_err = np.full(len(x_idx), np.nan)
+    for start in range(0, len(x_idx), config.ADF_BATCH_SIZE):
+        batch = np.arange(start, min(start + config.ADF_BATCH_SIZE,
+                                     len(x_idx)))
+        rows = [pair_rows(prices, x_idx[k], y_idx[k]) for k in batch]
+        std_err[batch] = last_std_err([row[0] for row in rows],
+                                      [row[1] for row in rows])
+    return std_err
+
+
+def _refresh_adf(state, x_idx, y_idx, slope, intercept, stdev_resd):
+    # ADF test, half-life and Hurst exponent again for pairs whose fit
+    # moved, stored by direction
+    adf_p = state["adf_p"][x_idx, y_idx]
+    half_lives = state["half_life"][x_idx, y_idx]
+    hursts = state["hurst"][x_idx, y_idx]
+    old_slope = state["adf_slope"][x_idx, y_idx]
+    old_stdev = state["adf_stdev"][x_idx, y_idx]
+    with np.errstate(invalid="ignore"):
+        stale = np.isnan(adf_p) | \
+            (np.abs(slope - old_slope) > config.ADF_REFRESH *
+             np.abs(old_slope)) | \
+            (np.abs(stdev_resd - old_stdev) > config.ADF_REFRESH * old_stdev)
+    stale = np.nonzero(stale)[0]
+
+    for start in range(0, len(stale), config.ADF_BATCH_SIZE):
+        batch = stale[start:start + config.ADF_BATCH_SIZE]
+        residuals = []
+        for k in batch:
+            x, y = pair_rows(state["prices"], x_idx[k], y_idx[k])
+            residuals.append(y - (intercept[k] + slope[k] * x))
+        adf_p[batch] = adf_pvalues(residuals)
+        residual_matrix = pad_rows(residuals)
+        half_lives[batch] = half_life(residual_matrix)
+        hursts[batch] = hurst(residual_matrix)
+
+    for key, values in (("adf_p", adf_p), ("adf_slope", slope),
+                        ("adf_stdev", stdev_resd), ("half_life", half_lives),
+                        ("hurst", hursts)):
+        state[key] = state[key].copy()
+        state[key][x_idx[stale], y_idx[stale]] = values[stale]
+    return adf_p, half_lives, hursts, len(stale)
+
+
+def scan_pairs(state, min_corr=None, min_ret_corr=None):
+    # result rows (row, label, ok) of the candidate pairs of the state
+    if min_corr is None:
+        min_corr = config.MIN_CORRELATION
+    if min_ret_corr is None:
+        min_ret_corr = config.MIN_RETURN_CORRELATION
+    symbols = state["symbols"]
+    prices = state["prices"]
+    count = len(symbols)
+
+    corr = correlation_from_sums(*[state[key] for key in _SUM_KEYS])
+    ret_corr = correlation_from_sums(
+        *[state["ret_" + key] for key in _SUM_KEYS])
+    keep = (corr >= min_corr) & (ret_corr >= min_ret_corr)
+    keep &= np.arange(count)[None, :] > np.arange(count)[:, None]
+    pairs_i, pairs_j = np.nonzero(keep)
+    print(len(pairs_i), " of ", count*(count-1)//2,
+          " pairs pass the correlation filter")
+
+    ok = state["n"][pairs_i, pairs_j] >= config.MIN_COMMON_BARS
+    fit_i = pairs_i[ok]
+    fit_j = pairs_j[ok]
+
+    with run_stats.stage("regression"):
+        slope, intercept, stdev_resd, intercept_stderr, err_ratio = \
+            regression_from_sums(*[state[key] for key in _SUM_KEYS],
+                                 state["shift"])
+    # direction with the smaller error ratio, as select_direction
+    swap = err_ratio[fit_j, fit_i] < err_ratio[fit_i, fit_j]
+    x_idx = np.where(swap, fit_j, fit_i)
+    y_idx = np.where(swap, fit_i, fit_j)
+    m = slope[x_idx, y_idx]
+    c = intercept[x_idx, y_idx]
+    sd = stdev_resd[x_idx, y_idx]
+
+    # signals of the last common bar
+    signal_start = time.perf_counter()
+    last = _last_common(prices, x_idx, y_idx)
+    x_last = prices[x_idx, last]
+    y_last = prices[y_idx, last]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std_err = (y_last - (c + m * x_last)) / sd
+        n = state["n"][x_idx, y_idx]
+        ratio_mu = state["ratio"][x_idx, y_idx] / n
+        ratio_std = np.sqrt(np.maximum(
+            state["ratio_sq"][x_idx, y_idx] / n - ratio_mu**2, 0.0))
+        cdf = ndtr((y_last / x_last - ratio_mu) / ratio_std)*100
+    if config.HEDGE_MODE != "static":
+        std_err = _hedge_std_err(prices, x_idx, y_idx)
+    m1_sig = M1_signal(cdf)
+    m2_sig = M2_signal(std_err)
+    run_stats.add_time("signal", time.perf_counter() - signal_start)
+    run_stats.count("unequal_length_rejects", len(ok) - ok.sum())
+    run_stats.count("pairs", len(ok))
+    # dates without a common bar, as align.pair_rows
+    run_stats.count("alignment_gaps", prices.shape[1] * len(x_idx) - n.sum())
+
+    with run_stats.stage("adf"):
+        p_values, half_lives, hursts, tested = _refresh_adf(
+            state, x_idx, y_idx, m, c, sd)
+    run_stats.count("adf_tested", tested)
+    print(tested, " of ", len(x_idx), " pairs tested again with ADF")
+    keep = reverting(half_lives, hursts)
+    run_stats.count("reversion_rejects", len(keep) - keep.sum())
+
+    rows = []
+    k = 0
+    for i, j, fitted in zip(pairs_i, pairs_j, ok):
+        label = symbols[i] + " & " + symbols[j]
+        if not fitted:
+            rows.append(((symbols[i]+"_"+symbols[j], "ERROR"), label, False))
+            continue
+        if keep[k]:
+            row = [symbols[x_idx[k]]+"_"+symbols[y_idx[k]], m1_sig[k], c[k],
+                   m[k], p_values[k]*100, std_err[k],
+                   corr[i, j]*100, m2_sig[k], half_lives[k], hursts[k]]
+            rows.append((row, label, True))
+        k += 1
+    return rows
+
+
+def daily_scan(symbols, prices, dates):
+    # rows of pair_scan.scan, from the stored state where possible
+    state = update_state(load_state(), symbols, prices, dates)
+    if state is None:
+        print("Building pair statistics from the full history ...")
+        state = build_state(symbols, prices, dates)
+    rows = scan_pairs(state)
+    save_state(state)
+    return rows
@@ -7,119 +7,72 @@ Inputs by User - symbols for stock to be analyzed
 Outputs - Statistics related to linear regression and ADF test.
 Authors - L & JJ
 
-1. No data is stored locally. historical data of last 24 months 
-   downloaded and saved in RAM. Stock split adjusted data 
+1. Historical data of last 24 months kept in a local cache (price_cache),
+   only new bars are downloaded. Stock split adjusted data 
    Yahoo Finance library is used for this purpose.
 2. Interval of 24 months is hard coded in the code
-3. Regression is calculated using two methods for cross verification
+3. Regression is calculated in closed form (pair_stats.ols_both) and
+   with statsmodels for cross verification
 4. Based on p-values from ADF test, stationarity of time series data is interpreted.
-5. Internet connection is required to download the data from nse website
+5. Internet connection is required to download the data from nse website,
+   unless recorded data is replayed (STOCK_PROVIDER=replay, see config.py)
+6. statsmodels and matplotlib are imported only for the summary and the
+   plot, run as "stock_cli.py analyze" to skip either
 """
 
 
 import numpy as np
-from sklearn.linear_model import LinearRegression
-from statsmodels.tsa.stattools import adfuller
-import statsmodels.api as sm
-import yfinance as yf
-import datetime
-import dateutil.relativedelta
-import matplotlib.pyplot as plt
 import sys
 
+import config
+import price_cache
+import price_store
+from align import align_pair
+from pair_stats import ols_both
+from adf_batch import adf_batch, mackinnon_crit
+
 
 def download_history(db_name):
     # download of full database
     print('Beginning data download for ', db_name)
-    
-    stock = yf.Ticker(db_name + ".NS")
 
-    hist = stock.history(period="2y")
+    # from the price store while it is fresh, otherwise only bars
+    # missing from the local cache are downloaded
+    close_price, times, tz = price_store.load_history(db_name)
 
     print("Data download finished.")
     print("\n")
-    
-    # extracting close price data alone
-    close_price = hist['Close'].to_numpy()
-    # extracting time list
-    time_frame = hist.axes[0].tolist()
-
-    return close_price, time_frame
-
-
-def regression(db1, db2):
-    x = db1
-    y = db2
 
-    # using scikit learn module
-    x_arr = np.array(x).reshape((-1, 1))
-    y_arr = np.array(y)
+    return close_price, times, tz
 
-    nan_list_x = np.argwhere(np.isnan(x_arr))
-    inf_list_x = np.argwhere(np.isinf(x_arr))
 
-    remove_list = []
-    for i in range(len(nan_list_x)):
-        remove_list.append(nan_list_x[i][0])
-    for i in range(len(inf_list_x)):
-        remove_list.append(inf_list_x[i][0])
+def main(db_1=None, db_2=None, summary=True, plot=True):
     
-    x_arr_ref1 = np.delete(x_arr, remove_list)
-    y_arr_ref1 = np.delete(y_arr, remove_list)
-    
-    nan_list_y = np.argwhere(np.isnan(y_arr))
-    inf_list_y = np.argwhere(np.isinf(y_arr))
-
-    remove_list = []
-    for i in range(len(nan_list_y)):
-        remove_list.append(nan_list_y[i][0])
-    for i in range(len(inf_list_y)):
-        remove_list.append(inf_list_y[i][0])
-    
-    x_arr_ref2 = np.delete(x_arr_ref1, remove_list)
-    y_arr_ref2 = np.delete(y_arr_ref1, remove_list)
-
-    x_arr_ref3 = np.array(x_arr_ref2).reshape((-1, 1))
-    y_arr_ref3 = np.array(y_arr_ref2)
-    model = LinearRegression().fit(x_arr_ref3, y_arr_ref3)
-    c = model.intercept_
-    m = model.coef_
-    
-    y_pred = model.intercept_ + model.coef_ * x
-    residuals = y - y_pred
-    stdev_resd = np.std(residuals)
-        
-    # using statmodels module
-    x_mod = sm.add_constant(x)
-    sm_model = sm.OLS(y, x_mod)
-    sm_res = sm_model.fit()
-
-    return x, y, y_pred, residuals, stdev_resd, c, m, sm_res
-
-
-if __name__ == "__main__":
-    
-    # symbol names to be input by user
-    db_1 = input("Enter Symbol for 1st company: ")
-    db_2 = input("Enter Symbol for 2nd company: ")
+    # symbol names to be input by user, unless given (stock_cli.py)
+    if db_1 is None:
+        db_1 = input("Enter Symbol for 1st company: ")
+    if db_2 is None:
+        db_2 = input("Enter Symbol for 2nd company: ")
     print("\n")
 
     # download historical data
-    db1_data, time_frame1 = download_history(db_1)
-    db2_data, time_frame2 = download_history(db_2)
+    db1_close, db1_times, tz = download_history(db_1)
+    db2_close, db2_times, tz = download_history(db_2)
+
+    # bars common to both stock, gaps handled per config.ALIGN_POLICY
+    times, db1_data, db2_data = align_pair(db1_times, db1_close,
+                                           db2_times, db2_close)
+    time_frame1 = price_cache.to_time_frame(times, tz)
     datalen = len(db1_data)
-    if len(db1_data) != len(db2_data):
-        sys.exit("ERROR: Length of data is different from both stock")
+    if datalen < config.MIN_COMMON_BARS:
+        sys.exit("ERROR: Too few common bars for both stock")
 
-    # linear regression
-    x1, y1, y1_pred, residuals1, stdev_resd1, c1, m1, sm_res1 =\
-            regression(db1_data, db2_data)
-    intercept_stderr_1 = sm_res1.bse[0]
+    # linear regression, both directions in one pass
+    fit_1, fit_2 = ols_both(db1_data, db2_data)
+    m1, c1, stdev_resd1, intercept_stderr_1, residuals1 = fit_1
     err_ratio_1 = intercept_stderr_1/stdev_resd1
 
-    x2, y2, y2_pred, residuals2, stdev_resd2, c2, m2, sm_res2 =\
-            regression(db2_data, db1_data)
-    intercept_stderr_2 = sm_res2.bse[0]
+    m2, c2, stdev_resd2, intercept_stderr_2, residuals2 = fit_2
     err_ratio_2 = intercept_stderr_2/stdev_resd2
     
     print("With X: ", db_1, " and Y: ", db_2, ", Error Ratio = ", err_ratio_1)
@@ -131,14 +84,16 @@ if __name__ == "__main__":
         c = c2
         residuals = residuals2
         stdev_resd = stdev_resd2
-        sm_res = sm_res2
+        x = db2_data
+        y = db1_data
         print("Selecting X: ", db_2, " and Y: ", db_1, " for further processing") 
     else:
         m = m1
         c = c1
         residuals = residuals1
         stdev_resd = stdev_resd1
-        sm_res = sm_res1
+        x = db1_data
+        y = db2_data
         print("Selecting X: ", db_1, " and Y: ", db_2, " for further processing") 
     
     print("Intercept: ", c)
@@ -149,29 +104,40 @@ if __name__ == "__main__":
     print("\n")
 
 
-    print("Sklearn module Result Summary")
+    print("Regression Result Summary")
     print("==============================================")
-    print("Slope: ", m[0])
+    print("Slope: ", m)
     print("Intercept: ", c)
     print("Std. Dev. of Residuals: ", stdev_resd)
     print("==============================================")
     print("\n")
     
-    print(sm_res.summary())
-    #print(dir(sm_res))
+    # statsmodels fit of the selected direction, for cross verification
+    if summary:
+        import statsmodels.api as sm
+
+        sm_res = sm.OLS(y, sm.add_constant(x), missing="drop").fit()
+        print(sm_res.summary())
+        #print(dir(sm_res))
 
     # Augmented Dickey–Fuller test on residuals
-    result = adfuller(residuals, regression='nc')
+    adf_stat, p_value, used_lag, nobs = adf_batch(
+        residuals[np.isfinite(residuals)])
+    crit_values = mackinnon_crit(nobs[0])
     print("\n")
     print("===========ADF Summary==============")
-    print('ADF Statistic: %f' % result[0])
-    print('p-value: %f' % result[1])
+    print('ADF Statistic: %f' % adf_stat[0])
+    print('p-value: %f' % p_value[0])
     print('Critical Values:')
-    for key, value in result[4].items():
+    for key, value in zip(("1%", "5%", "10%"), crit_values):
             print('\t%s: %.3f' % (key, value))
     print("===================================") 
 
     # graph for trend visualization
+    if not plot:
+        return
+    import matplotlib.pyplot as plt
+
     plt.plot(time_frame1, residuals)
     plt.hlines(stdev_resd, time_frame1[0], \
         time_frame1[datalen-1], 'r', '--', label='1 SD')
@@ -189,3 +155,7 @@ if __name__ == "__main__":
         time_frame1[datalen-1], 'k', '--', label='Mean')
     plt.legend()
     plt.show()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,226 +11,133 @@ Authors - L & JJ
 1. uses the base code from stock-4 program
 2. utilizes yfinance api
 3. hard coded time interval 2 years
-4. yfinance limit per hour - 2000 requests, 
-   intentional delay to be used to prevent IP block
-5. Code captures unequal length data, NaN values and Inf values
-   related error
-6. Data output in csv file
+4. yfinance limit per hour - 2000 requests, every symbol is
+   downloaded once per run (price_matrix), concurrently under a
+   token bucket sized to that budget (fetch_pool); the price matrix is
+   memory-mapped from price_store, refreshed only with new bars
+5. Histories are aligned on their dates (align.py, config.ALIGN_POLICY)
+   instead of rejecting unequal lengths; NaN and Inf values skipped
+6. Pairs below the correlation thresholds in config.py are skipped
+   before regression and ADF
+7. ADF test runs on config.ADF_BATCH_SIZE pairs at a time (adf_batch),
+   chunks of pairs are scanned on config.SCAN_WORKERS processes
+   (pair_scan)
+8. Data output in csv (or parquet/arrow) file in config.OUTPUT_DIR,
+   written through results_sink
+9. Source of price data (yahoo, replay, synthetic) selected with
+   STOCK_PROVIDER, see config.py and price_provider.py
+10. With STOCK_INCREMENTAL=1 (stock_cli.py scan --incremental) pair
+    statistics are kept between runs and only new bars are processed,
+    see scan_state.py
+11. Stage timings and counters (run_stats.py) are written to
+    batch_report_<date>.json in config.OUTPUT_DIR; a progress line with
+    throughput and ETA every STOCK_PROGRESS_INTERVAL seconds
+    (stock_cli.py scan --progress SECONDS)
+12. With STOCK_SCREEN_TOP_K=K (stock_cli.py scan --top K) pairs go
+    through the staged filters of pair_screen.py and only the K best
+    are written, ranked, to batch_top_<date>
 """
 
 
-import numpy as np
-from sklearn.linear_model import LinearRegression
-from statsmodels.tsa.stattools import adfuller
-import statsmodels.api as sm
-import yfinance as yf
-import datetime
-import dateutil.relativedelta
-import matplotlib.pyplot as plt
-from itertools import combinations
-from scipy.stats import norm 
+import os
 import time
+import datetime
 
-
-def download_history(db_name):
-    # download of full database    
-    stock = yf.Ticker(db_name + ".NS")
-
-    hist = stock.history(period="2y")
-    
-    # extracting close price data alone
-    close_price = hist['Close'].to_numpy()
-    # extracting time list
-    time_frame = hist.axes[0].tolist()
-
-    return close_price, time_frame
-
-
-def regression(db1, db2):
-    x = db1
-    y = db2
-    
-    # using scikit learn module
-    x_arr = np.array(x).reshape((-1, 1))
-    y_arr = np.array(y)
-
-    nan_list_x = np.argwhere(np.isnan(x_arr))
-    inf_list_x = np.argwhere(np.isinf(x_arr))
-
-    remove_list = []
-    for i in range(len(nan_list_x)):
-        remove_list.append(nan_list_x[i][0])
-    for i in range(len(inf_list_x)):
-        remove_list.append(inf_list_x[i][0])
-    
-    x_arr_ref1 = np.delete(x_arr, remove_list)
-    y_arr_ref1 = np.delete(y_arr, remove_list)
-    
-    nan_list_y = np.argwhere(np.isnan(y_arr))
-    inf_list_y = np.argwhere(np.isinf(y_arr))
-
-    remove_list = []
-    for i in range(len(nan_list_y)):
-        remove_list.append(nan_list_y[i][0])
-    for i in range(len(inf_list_y)):
-        remove_list.append(inf_list_y[i][0])
-    
-    x_arr_ref2 = np.delete(x_arr_ref1, remove_list)
-    y_arr_ref2 = np.delete(y_arr_ref1, remove_list)
-
-    x_arr_ref3 = np.array(x_arr_ref2).reshape((-1, 1))
-    y_arr_ref3 = np.array(y_arr_ref2)
-    
-    model = LinearRegression().fit(x_arr_ref3, y_arr_ref3)
-    c = model.intercept_
-    m = model.coef_
-    
-    y_pred = model.intercept_ + model.coef_ * x
-    residuals = y - y_pred
-    stdev_resd = np.std(residuals)
-        
-    # using statmodels module
-    x_mod = sm.add_constant(x)
-    sm_model = sm.OLS(y, x_mod)
-    sm_res = sm_model.fit()
-
-    return x, y, y_pred, residuals, stdev_resd, c, m, sm_res
-
-
-def M1_signal(x, y, datalen):
-    cp_ratio = []
-
-    for i in range(datalen):
-        cp_ratio.append(y[i]/x[i])
-
-    mu = np.mean(cp_ratio)
-    std = np.std(cp_ratio)
-    cdf = norm(mu, std).cdf(cp_ratio[datalen-1])*100
-
-    signal = ""
-    if (cdf >= 0.3) and (cdf <= 2.5):
-        signal = "LONG"
-    elif (cdf >= 97.5) and (cdf <= 99.7):
-        signal = "SHORT"
-    else:
-        signal = "NOSIG"
-    return signal
-
-
-def M2_signal(std_err):
-    signal = ""
-    if (std_err <= -2.5):
-        signal = "LONG"
-    elif (std_err >= 2.5):
-        signal = "SHORT"
-    else:
-        signal = "NOSIG"
-
-    return signal 
-
-
-def correlation(x, y):
-    corr_coeff = np.cov(x, y, bias=True)[0][1]/np.std(x)/np.std(y)
-    return corr_coeff
-
-
-if __name__ == "__main__":
+from price_store import load_matrix
+from align import fill_matrix
+from pair_scan import scan, scan_inputs, RESULT_COLUMNS
+from results_sink import ResultSink
+from pair_screen import screen, SCREEN_COLUMNS
+import scan_state
+import run_stats
+import config
+
+
+def full_scan(symbols_arr, prices):
+    # number of candidate pairs and the generator of their result rows,
+    # candidate pairs and the regression of every pair in both
+    # directions; pairs are processed in chunks (ADF runs on a whole
+    # chunk at once), on config.SCAN_WORKERS processes
+    scan_data = scan_inputs(prices)
+    pairs_i = scan_data["pairs_i"]
+    print(len(pairs_i), " of ", len(symbols_arr)*(len(symbols_arr)-1)//2,
+          " pairs pass the correlation filter")
+    return len(pairs_i), scan(scan_data, symbols_arr)
+
+
+def top_scan(symbols_arr, prices):
+    # number of candidate pairs and the rows of the config.SCREEN_TOP_K
+    # best pairs, best first
+    rows, total = screen(symbols_arr, prices,
+                         progress=run_stats.Progress())
+    return total, [[(row, row[0], True) for row in rows]]
+
+
+def main(fname=None, incremental=None):
     
     # reading symbols from list file
-    fname = "/home/euler/Documents/Projects/Stock/list.csv"
+    if fname is None:
+        fname = os.path.join(config.DATA_DIR, "list.csv")
+    if incremental is None:
+        incremental = config.INCREMENTAL
     fd = open(fname, "r")
     lines = fd.readlines()
     fd.close()
 
+    run_start = time.time()
+    run_stats.reset()
     symbols_arr = []
     for line in lines[1:]:
         var = line.split(",")
         symbols_arr.append(var[1].strip())
 
-    symbol_comb = list(combinations(symbols_arr, 2))
-    
-    # open file for results
+    # download every symbol once, pairs index into the price matrix
+    print("Loading price history for ", len(symbols_arr), " symbols ...")
+    prices, dates, tz = load_matrix(symbols_arr)
+    # missing bars filled per config.ALIGN_POLICY, once per symbol
+    prices = fill_matrix(prices)
+
+    # results file, the ranked shortlist when screening
     date_today = str(datetime.date.today())
-    fname = "/home/euler/Documents/Projects/Stock/batch_result_" +\
-        date_today+".csv"
-    fd = open(fname, "w+")
-    
-    # writing headers
-    fd.write("Pairs,")
-    fd.write("M1-signal,")
-    fd.write("Intercept,")
-    fd.write("Slope,")
-    fd.write("p-value,")
-    fd.write("std_err,")
-    fd.write("Correlation,")
-    fd.write("M2-signal")
-    fd.write("\n")
-
-    counter = 0
-    for comb in symbol_comb[:100]:
-        result_bucket = ""
-        x = []
-        y = []
-        m1_sig = ""
-        m2_sig = ""
-        
-        db_1 = comb[0]
-        db_2 = comb[1]
-
-        # download historical data
-        db1_data, time_frame1 = download_history(db_1)
-        db2_data, time_frame2 = download_history(db_2)
-        datalen = len(db1_data)
-        if len(db1_data) != len(db2_data):
-            print("ERROR: Unequal Length ", db_1, " & ", db_2)
-            fd.write(db_1+"_"+db_2+","+"ERROR")
-            fd.write("\n")
-            continue
-
-        # linear regression
-        x1, y1, y1_pred, residuals1, stdev_resd1, c1, m1, \
-            sm_res1 = regression(db1_data, db2_data)
-        intercept_stderr_1 = sm_res1.bse[0]
-        err_ratio_1 = intercept_stderr_1/stdev_resd1
-
-        x2, y2, y2_pred, residuals2, stdev_resd2, c2, m2, \
-            sm_res2 = regression(db2_data, db1_data)
-        intercept_stderr_2 = sm_res2.bse[0]
-        err_ratio_2 = intercept_stderr_2/stdev_resd2
-
-        if err_ratio_2 < err_ratio_1:
-            m = m2
-            c = c2
-            residuals = residuals2
-            stdev_resd = stdev_resd2
-            sm_res = sm_res2
-            x = db2_data
-            y = db1_data
-            result_bucket += db_2+"_"+db_1+","
-        else:
-            m = m1
-            c = c1
-            residuals = residuals1
-            stdev_resd = stdev_resd1
-            sm_res = sm_res1
-            x = db1_data
-            y = db2_data
-            result_bucket += db_1+"_"+db_2+","
-        
-        std_err = residuals[datalen-1]/stdev_resd
-        corr_per = correlation(x, y)*100
-        m1_sig = M1_signal(x, y, datalen)
-        m2_sig = M2_signal(std_err)
-
-        # Augmented Dickey–Fuller test on residuals
-        adf_result = adfuller(residuals, regression='nc')
-        p_value = adf_result[1]*100
-
-        result_bucket += m1_sig + "," + str(c) + "," + \
-            str(m[0]) + "," + str(p_value) + "," + str(std_err) +\
-                "," + str(corr_per) + "," + m2_sig + "\n"
-        print("Writing data for ", db_1, " & ", db_2, " ...")
-        fd.write(result_bucket)
-        time.sleep(1)
-
-    fd.close()
\ No newline at end of file
+    screened = config.SCREEN_TOP_K > 0 and not incremental
+    if screened:
+        sink = ResultSink("batch_top_" + date_today, SCREEN_COLUMNS)
+    else:
+        sink = ResultSink("batch_result_" + date_today, RESULT_COLUMNS)
+
+    if incremental:
+        # only new bars are added to the stored pair statistics
+        results = [scan_state.daily_scan(symbols_arr, prices, dates)]
+        total = len(results[0])
+    elif screened:
+        total, results = top_scan(symbols_arr, prices)
+    else:
+        total, results = full_scan(symbols_arr, prices)
+
+    progress = run_stats.Progress(total)
+    for rows in results:
+        for row, label, ok in rows:
+            if ok:
+                print("Writing data for ", label, " ...")
+            else:
+                print("ERROR: Too few common bars ", label)
+            sink.write(row)
+        progress.advance(len(rows))
+
+    sink.close()
+
+    # timings and counters of the run
+    report_path = os.path.join(config.OUTPUT_DIR,
+                               "batch_report_" + date_today + ".json")
+    run_stats.write_report(report_path, symbols=len(symbols_arr),
+                           bars=prices.shape[1], candidate_pairs=total,
+                           provider=config.PROVIDER,
+                           incremental=bool(incremental),
+                           workers=config.SCAN_WORKERS,
+                           started=run_start,
+                           seconds=time.time() - run_start)
+    print("Run report written to ", report_path)
+
+
+if __name__ == "__main__":
+    main()
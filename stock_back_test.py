@@ -4,130 +4,140 @@
 DoC - December, 28th Dec, 2020
 Description - for back test
 Inputs by User - symbol file in format : <company name-Y_company_name-X>
-Outputs - <pairs>, <%efficiency M1>, <%efficiency M2> 
+Outputs - <pairs>, <%efficiency M1>, <%efficiency M2>, <status>
 Authors - L & JJ
 
-1. Data output in csv file
+1. Data output in csv (or parquet/arrow) file in config.OUTPUT_DIR,
+   written through results_sink; Status (OK / ERROR) is the last column,
+   the efficiencies of ERROR rows are empty (NO TRADE is a pair tested
+   without trades)
+2. Source of price data (yahoo, replay, synthetic) selected with
+   STOCK_PROVIDER, see config.py and price_provider.py
+3. Trades are found with array masks for config.BACKTEST_BATCH_SIZE
+   pairs at a time (fewer for long intraday histories, see
+   backtest_engine.pairs_per_batch), all pairs of the input file are
+   tested
+4. M2 z-scores from one fit on the full history (look-ahead) or, with
+   STOCK_HEDGE_MODE=rolling, from a walk-forward fit over the last
+   config.ROLLING_WINDOW bars (pair_stats.rolling_ols), or with
+   STOCK_HEDGE_MODE=kalman from a Kalman filter (kalman_hedge.py)
+5. Sweep mode (stock_cli.py backtest --sweep) tests every combination
+   of the threshold grids in config.py (SWEEP_*) on all pairs in one
+   pass and writes trades, efficiency and P/L per pair and combination
+   to sweep_M1_<date> and sweep_M2_<date>
 """
 
-import math
+import os
+import itertools
 import numpy as np
-from sklearn.linear_model import LinearRegression
-import yfinance as yf
 import datetime
-import dateutil.relativedelta
-from itertools import combinations
-from scipy.stats import norm 
-import time
 
+import config
+from price_store import load_histories
+from align import align_pair
+from pair_stats import ratio_cdf, M2_std_err
+from results_sink import ResultSink, BLANK
+from backtest_engine import find_trades, efficiency, pad_rows, \
+    sweep_trades, m1_rule, m2_rule, pairs_per_batch
 
-def download_history(db_name):
-    # download of full database    
-    stock = yf.Ticker(db_name + ".NS")
-
-    hist = stock.history(period="2y")
-    
-    # extracting close price data alone
-    close_price = hist['Close'].to_numpy()
-    # extracting time list
-    time_frame = hist.axes[0].tolist()
-
-    return close_price, time_frame
 
 def M1_cdf(x, y, datalen):
-    cp_ratio = []
-    cdf = []
-
-    for i in range(datalen):
-        cp_ratio.append(float(y[i])/float(x[i]))
-
-    mu = np.mean(cp_ratio)
-    std = np.std(cp_ratio)
-
-    for ratio in cp_ratio:
-        cdf.append(norm(mu, std).cdf(ratio)*100)
-    
-    return cdf
-
-def M1_signal(cdf):
-    if (cdf >= 0.3) and (cdf <= 2.5):
-        signal = "LONG"
-    elif (cdf >= 97.5) and (cdf <= 99.7):
-        signal = "SHORT"
-    else:
-        signal = "NOSIG"
-    return signal
-
-def M2_std_err(x, y):
-    
-    # using scikit learn module
-    x_arr = np.array(x).reshape((-1, 1))
-    y_arr = np.array(y)
-
-    # =======================Error Handling==========================
-    nan_list_x = np.argwhere(np.isnan(x_arr))
-    inf_list_x = np.argwhere(np.isinf(x_arr))
-
-    remove_list = []
-    for i in range(len(nan_list_x)):
-        remove_list.append(nan_list_x[i][0])
-    for i in range(len(inf_list_x)):
-        remove_list.append(inf_list_x[i][0])
-    
-    x_arr_ref1 = np.delete(x_arr, remove_list)
-    y_arr_ref1 = np.delete(y_arr, remove_list)
-    
-    nan_list_y = np.argwhere(np.isnan(y_arr))
-    inf_list_y = np.argwhere(np.isinf(y_arr))
-
-    remove_list = []
-    for i in range(len(nan_list_y)):
-        remove_list.append(nan_list_y[i][0])
-    for i in range(len(inf_list_y)):
-        remove_list.append(inf_list_y[i][0])
-    
-    x_arr_ref2 = np.delete(x_arr_ref1, remove_list)
-    y_arr_ref2 = np.delete(y_arr_ref1, remove_list)
-    # ======================Error Handling Ends======================
-
-    x_arr_ref3 = np.array(x_arr_ref2).reshape((-1, 1))
-    y_arr_ref3 = np.array(y_arr_ref2)
-    
-    model = LinearRegression().fit(x_arr_ref3, y_arr_ref3)
-    c = model.intercept_
-    m = model.coef_
-    
-    y_pred = model.intercept_ + model.coef_ * x
-    residuals = y - y_pred
-    stdev_resd = np.std(residuals)
-
-    std_err = []
-    for resd in residuals:
-        std_err.append(resd/stdev_resd)
-
-    return std_err
+    # normal cdf (%) of the price ratio, all bars at once
+    return ratio_cdf(x[:datalen], y[:datalen])
+
+# entry and hold bands of both signals, see backtest_engine.py
+M1_RULE = {"long_entry": (0.3, 2.5), "short_entry": (97.5, 99.7),
+           "long_hold": (0.3, 2.5), "short_hold": (97.5, 99.7)}
+M2_RULE = {"long_entry": (-np.inf, -2.5), "short_entry": (2.5, np.inf),
+           "long_hold": (-3.0, -2.0), "short_hold": (2.0, 3.0)}
+
+def load_pairs(pairs_arr, histories):
+    # result rows of a batch of pairs (status set), index of the rows
+    # with enough data and their M1 cdf, X and Y as padded matrices
+    rows = []
+    ok_pairs = []
+    cdf_rows = []
+    x_rows = []
+    y_rows = []
+    for comb in pairs_arr:
+        Y = comb[0] # Y as per nomenclature we follow
+        X = comb[1] # X as per nomenclature we follow
+        print(Y, X)
 
-def M2_signal(std_err):
-    if (std_err <= -2.5):
-        signal = "LONG"
-    elif (std_err >= 2.5):
-        signal = "SHORT"
-    else:
-        signal = "NOSIG"
+        # historical data
+        Y_close, Y_times, Y_tz = histories[Y]
+        X_close, X_times, X_tz = histories[X]
 
-    return signal 
+        # bars common to both stock, gaps handled per config.ALIGN_POLICY
+        times, Y_data, X_data = align_pair(Y_times, Y_close,
+                                           X_times, X_close)
 
-def diophantine(a, b):
-    # a*x - b*y = 0
-    d = math.gcd(int(a), int(b))
-    x = b/d
-    y = a*x/b
-    return int(x), int(y)
+        if len(Y_data) < config.MIN_COMMON_BARS:
+            print("ERROR: Too few common bars ", Y, " & ", X)
+            # no efficiency at all, not "NO TRADE"
+            rows.append([Y+"_"+X, BLANK, BLANK, "ERROR"])
+            continue
 
-if __name__ == "__main__":
+        datalen = len(Y_data)
+        cdf_rows.append(M1_cdf(X_data, Y_data, datalen))
+        x_rows.append(X_data)
+        y_rows.append(Y_data)
+        ok_pairs.append(len(rows))
+        rows.append([Y+"_"+X, None, None, "OK"])
+
+    # pairs of different lengths are padded with NaN
+    return rows, ok_pairs, pad_rows(cdf_rows), pad_rows(x_rows), \
+        pad_rows(y_rows)
+
+def backtest_rows(pairs_arr, histories):
+    # efficiency of M1 and M2 for a batch of pairs, rows in pair order
+    rows, ok_pairs, cdf, x, y = load_pairs(pairs_arr, histories)
+
+    # trades of all pairs at once
+    M1_eff = efficiency(find_trades(cdf, x, y, M1_RULE), len(ok_pairs))
+    M2_eff = efficiency(find_trades(M2_std_err(x, y), x, y, M2_RULE),
+                        len(ok_pairs))
+
+    for k, idx in enumerate(ok_pairs):
+        rows[idx][1] = None if np.isnan(M1_eff[k]) else M1_eff[k]
+        rows[idx][2] = None if np.isnan(M2_eff[k]) else M2_eff[k]
+    return rows
+
+def backtest_pairs(pairs_arr, histories, sink):
+    for row in backtest_rows(pairs_arr, histories):
+        sink.write(row)
+
+def sweep_grids():
+    # (parameters, rule) of every combination of the config grids
+    m1 = [((low, high), m1_rule(low, high)) for low, high in
+          itertools.product(config.SWEEP_M1_LOW, config.SWEEP_M1_HIGH)]
+    m2 = [((entry, exit_, stop), m2_rule(entry, exit_, stop))
+          for entry, exit_, stop in itertools.product(
+              config.SWEEP_M2_ENTRY, config.SWEEP_M2_EXIT,
+              config.SWEEP_M2_STOP)]
+    return m1, m2
+
+def sweep_pairs(pairs_arr, histories, m1_sink, m2_sink):
+    # trades, efficiency and P/L of every threshold combination
+    rows, ok_pairs, cdf, x, y = load_pairs(pairs_arr, histories)
+    m1_grid, m2_grid = sweep_grids()
+
+    for sink, grid, values in ((m1_sink, m1_grid, cdf),
+                               (m2_sink, m2_grid, M2_std_err(x, y))):
+        surface = sweep_trades(values, x, y, [rule for _, rule in grid])
+        for k, idx in enumerate(ok_pairs):
+            for g, (params, rule) in enumerate(grid):
+                eff = surface["efficiency"][g, k]
+                sink.write((rows[idx][0],) + params +
+                           (surface["trades"][g, k],
+                            None if np.isnan(eff) else eff,
+                            surface["pnl"][g, k]))
+
+def main(fname=None, sweep=False):
     
     # reading symbol pairs from list file
-    fname = "/home/euler/Documents/Projects/Stock/batch_result_filtered.csv"
+    if fname is None:
+        fname = os.path.join(config.DATA_DIR, "batch_result_filtered.csv")
     fd = open(fname, "r")
     lines = fd.readlines()
     fd.close()
@@ -139,180 +149,47 @@ if __name__ == "__main__":
         var1 = var[0].split("_")
         symbols_arr.append([var1[0], var1[1]])
 
-    
-    # open file for results
-    date_today = str(datetime.date.today())
-    fname = "/home/euler/Documents/Projects/Stock/backtest_result_" +\
-        date_today+".csv"
-    fd = open(fname, "w+")
-    
-    # writing headers
-    fd.write("Pairs,")
-    fd.write("M1-Efficiency(%),")
-    fd.write("M2-Efficiency(%),")
-    fd.write("\n")
-    
-
-    for comb in symbols_arr[:25]:
-        result_bucket = ""
-
-        Y = comb[0] # Y as per nomenclature we follow
-        X = comb[1] # X as per nomenclature we follow
-        print(Y, X)
-        result_bucket += Y + "_" + X + ","
-
-        # download historical data
-        Y_data, time_frame1 = download_history(Y)
-        X_data, time_frame2 = download_history(X)
-        
-        if len(Y_data) != len(X_data):
-            print("ERROR: Unequal Length ", Y, " & ", X)
-            fd.write(Y+"_"+X+","+"ERROR")
-            fd.write("\n")
-            continue
-
-        datalen = len(Y_data)
-
-        #===============================M1 Signal==============================
-        cdf_arr = M1_cdf(X_data, Y_data, datalen)
-
-        trade_inprogress = 0
-        # start and end prices for X & Y
-        x1 = 0
-        y1 = 0
-        x2 = 0
-        y2 = 0
-
-        signal = ""
-        profit_trades = 0
-        loss_trades = 0
-        neutral_trades = 0 
-        for i in range(datalen):
-            cdf = cdf_arr[i]
-            if trade_inprogress == 0:
-                signal = M1_signal(cdf)
-                y1 = Y_data[i]
-                x1 = X_data[i]
-                X_qty, Y_qty = diophantine(x1, y1)
-                #print(X_qty*x1 - Y_qty*y1)
-            
-            if signal == "LONG":
-                trade_inprogress = 1
-                if (cdf < 0.3) or (cdf > 2.5):
-                    trade_inprogress = 0
-                    y2 = Y_data[i]
-                    x2 = X_data[i]
-                    measure = (y2-y1)*Y_qty + (x1-x2)*X_qty
-                    if measure > 0:
-                        profit_trades += 1
-                    elif measure < 0:
-                        loss_trades += 1
-                    else:
-                        neutral_trades += 1
-                    trade_inprogress = 0
-            elif signal == "SHORT":
-                trade_inprogress = 1
-                if (cdf < 97.5) or (cdf > 99.7):
-                    trade_inprogress = 0
-                    y2 = Y_data[i]
-                    x2 = X_data[i]
-                    measure = (y1-y2)*Y_qty + (x2-x1)*X_qty
-                    if measure > 0:
-                        profit_trades += 1
-                    elif measure < 0:
-                        loss_trades += 1
-                    else:
-                        neutral_trades += 1
-                    trade_inprogress = 0
-            else:
-                pass
-        
-        try:
-            M1_eff_per = 100*profit_trades/(profit_trades+\
-                loss_trades+neutral_trades)
-        except:
-            M1_eff_per = "NO TRADE"
-
-        result_bucket += str(M1_eff_per) + ","
-        #======================================================================
-
-        #===============================M2 Signal==============================
-        std_err_arr = M2_std_err(X_data, Y_data)
-
-        trade_inprogress = 0
-        # start and end prices for X & Y
-        x1 = 0
-        y1 = 0
-        x2 = 0
-        y2 = 0
-
-        signal = ""
-        profit_trades = 0
-        loss_trades = 0
-        neutral_trades = 0 
-        for i in range(datalen):
-            std_err = std_err_arr[i]
-            if trade_inprogress == 0:
-                signal = M2_signal(std_err)
-                y1 = Y_data[i]
-                x1 = X_data[i]
-                X_qty, Y_qty = diophantine(x1, y1)
-                #print(X_qty*x1 - Y_qty*y1)
-            
-            if signal == "LONG":
-                trade_inprogress = 1
-                if (std_err < -3.0) or (std_err > -2.0):
-                    trade_inprogress = 0
-                    y2 = Y_data[i]
-                    x2 = X_data[i]
-                    measure = (y2-y1)*Y_qty + (x1-x2)*X_qty
-                    if measure > 0:
-                        profit_trades += 1
-                    elif measure < 0:
-                        loss_trades += 1
-                    else:
-                        neutral_trades += 1
-                    trade_inprogress = 0
-            elif signal == "SHORT":
-                trade_inprogress = 1
-                if (std_err < 2) or (std_err > 3):
-                    trade_inprogress = 0
-                    y2 = Y_data[i]
-                    x2 = X_data[i]
-                    measure = (y1-y2)*Y_qty + (x2-x1)*X_qty
-                    if measure > 0:
-                        profit_trades += 1
-                    elif measure < 0:
-                        loss_trades += 1
-                    else:
-                        neutral_trades += 1
-                    trade_inprogress = 0
-            else:
-                pass
-
-        try:
-            M2_eff_per = 100*profit_trades/(profit_trades+\
-                loss_trades+neutral_trades)
-        except:
-            M2_eff_per = "NO TRADE"
-
-        result_bucket += str(M2_eff_per)
-        #======================================================================
-
-        fd.write(result_bucket)
-        fd.write("\n")
-
-        time.sleep(0.5)
-
-    fd.close()
-
-        
-        
-
-
-
-                
 
+    # download every symbol once, concurrently
+    pairs_arr = symbols_arr
+    histories = load_histories(
+        sorted(set(symbol for comb in pairs_arr for symbol in comb)))
+    # pairs per batch, fewer for long (intraday) histories
+    step = pairs_per_batch(max([len(hist[1]) for hist in
+                                histories.values()] + [0]))
 
+    # open file for results
+    date_today = str(datetime.date.today())
+    if sweep:
+        # efficiency and P/L surface over the threshold grids of config
+        tail = [("Trades", "int"),
+                ("Efficiency(%)", "float"),
+                ("Profit/Loss", "float")]
+        m1_sink = ResultSink("sweep_M1_" + date_today,
+                             [("Pairs", "str"), ("Low", "float"),
+                              ("High", "float")] + tail)
+        m2_sink = ResultSink("sweep_M2_" + date_today,
+                             [("Pairs", "str"), ("Entry", "float"),
+                              ("Exit", "float"), ("Stop", "float")] + tail)
+        for k in range(0, len(pairs_arr), step):
+            sweep_pairs(pairs_arr[k:k + step], histories, m1_sink, m2_sink)
+        m1_sink.close()
+        m2_sink.close()
+        return
+
+    sink = ResultSink("backtest_result_" + date_today,
+                      [("Pairs", "str"),
+                       ("M1-Efficiency(%)", "float"),
+                       ("M2-Efficiency(%)", "float"),
+                       ("Status", "str")],
+                      na_rep={"M1-Efficiency(%)": "NO TRADE",
+                              "M2-Efficiency(%)": "NO TRADE"})
+
+    for k in range(0, len(pairs_arr), step):
+        backtest_pairs(pairs_arr[k:k + step], histories, sink)
+
+    sink.close()
 
 
+if __name__ == "__main__":
+    main()
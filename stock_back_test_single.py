@@ -8,259 +8,99 @@ Outputs - <Trade Start Date>, <Trade Exit Date>, <Signal Type>, <Profit/Loss>,
 <Qty. X>, <Qty. Y>
 Authors - L & JJ
 
-1. Data output in csv file
+1. Data output in csv (or parquet/arrow) file in config.OUTPUT_DIR,
+   written through results_sink
+2. Source of price data (yahoo, replay, synthetic) selected with
+   STOCK_PROVIDER, see config.py and price_provider.py
+3. Trades are found with array masks (backtest_engine.py)
+4. M2 z-scores from one fit on the full history (look-ahead) or, with
+   STOCK_HEDGE_MODE=rolling, from a walk-forward fit over the last
+   config.ROLLING_WINDOW bars (pair_stats.rolling_ols), or with
+   STOCK_HEDGE_MODE=kalman from a Kalman filter (kalman_hedge.py)
 """
 
-import math
-import numpy as np
-from sklearn.linear_model import LinearRegression
-import yfinance as yf
 import datetime
-import dateutil.relativedelta
-from itertools import combinations
-from scipy.stats import norm 
-import time
-import sys
-
-
-def download_history(db_name):
-    # download of full database    
-    stock = yf.Ticker(db_name + ".NS")
 
-    hist = stock.history(period="2y")
-    
-    # extracting close price data alone
-    close_price = hist['Close'].to_numpy()
-    # extracting time list
-    time_frame = hist.axes[0].tolist()
+import config
+from price_cache import to_time_frame
+from price_store import load_history
+from align import align_pair
+from pair_stats import ratio_cdf, M2_std_err
+from results_sink import ResultSink
+from backtest_engine import find_trades
+import sys
 
-    return close_price, time_frame
 
 def M1_cdf(x, y, datalen):
-    cp_ratio = []
-    cdf = []
-
-    for i in range(datalen):
-        cp_ratio.append(float(y[i])/float(x[i]))
-
-    mu = np.mean(cp_ratio)
-    std = np.std(cp_ratio)
-
-    for ratio in cp_ratio:
-        cdf.append(norm(mu, std).cdf(ratio)*100)
-    
-    return cdf
-
-def M1_signal(cdf):
-    if (cdf >= 0.3) and (cdf <= 2.5):
-        signal = "LONG"
-    elif (cdf >= 97.5) and (cdf <= 99.7):
-        signal = "SHORT"
-    else:
-        signal = "NOSIG"
-    return signal
-
-def M2_std_err(x, y):
-    
-    # using scikit learn module
-    x_arr = np.array(x).reshape((-1, 1))
-    y_arr = np.array(y)
-
-    # =======================Error Handling==========================
-    nan_list_x = np.argwhere(np.isnan(x_arr))
-    inf_list_x = np.argwhere(np.isinf(x_arr))
-
-    remove_list = []
-    for i in range(len(nan_list_x)):
-        remove_list.append(nan_list_x[i][0])
-    for i in range(len(inf_list_x)):
-        remove_list.append(inf_list_x[i][0])
-    
-    x_arr_ref1 = np.delete(x_arr, remove_list)
-    y_arr_ref1 = np.delete(y_arr, remove_list)
-    
-    nan_list_y = np.argwhere(np.isnan(y_arr))
-    inf_list_y = np.argwhere(np.isinf(y_arr))
-
-    remove_list = []
-    for i in range(len(nan_list_y)):
-        remove_list.append(nan_list_y[i][0])
-    for i in range(len(inf_list_y)):
-        remove_list.append(inf_list_y[i][0])
-    
-    x_arr_ref2 = np.delete(x_arr_ref1, remove_list)
-    y_arr_ref2 = np.delete(y_arr_ref1, remove_list)
-    # ======================Error Handling Ends======================
-
-    x_arr_ref3 = np.array(x_arr_ref2).reshape((-1, 1))
-    y_arr_ref3 = np.array(y_arr_ref2)
-    
-    model = LinearRegression().fit(x_arr_ref3, y_arr_ref3)
-    c = model.intercept_
-    m = model.coef_
+    # normal cdf (%) of the price ratio, all bars at once
+    return ratio_cdf(x[:datalen], y[:datalen])
+
+# entry and hold bands of both signals, see backtest_engine.py
+M1_RULE = {"long_entry": (0.3, 2.5), "short_entry": (97.5, 99.7),
+           "long_hold": (0.3, 2.5), "short_hold": (97.5, 99.7)}
+M2_RULE = {"long_entry": (-3.0, -2.5), "short_entry": (2.5, 3.0),
+           "long_hold": (-3.0, -2.0), "short_hold": (2.0, 3.0)}
+
+def write_trades(sink, trades, times, tz, name):
+    # Timestamps of the trade bars only, not of the whole history
+    entry_time = to_time_frame(times[trades["entry"]], tz)
+    exit_time = to_time_frame(times[trades["exit"]], tz)
+    for k in range(len(trades["entry"])):
+        signal = "LONG" if trades["long"][k] else "SHORT"
+        sink.write((str(entry_time[k]),
+                    str(exit_time[k]),
+                    name + "_" + signal, trades["measure"][k],
+                    trades["x_qty"][k], trades["y_qty"][k]))
+
+def main(Y=None, X=None):
     
-    y_pred = model.intercept_ + model.coef_ * x
-    residuals = y - y_pred
-    stdev_resd = np.std(residuals)
-
-    std_err = []
-    for resd in residuals:
-        std_err.append(resd/stdev_resd)
-
-    return std_err
-
-def M2_signal(std_err):
-    if (std_err <= -2.5 and std_err >= -3.0):
-        signal = "LONG"
-    elif (std_err >= 2.5 and std_err <= 3.0):
-        signal = "SHORT"
-    else:
-        signal = "NOSIG"
-
-    return signal 
-
-def diophantine(a, b):
-    # a*x - b*y = 0
-    d = math.gcd(int(a), int(b))
-    x = b/d
-    y = a*x/b
-    return int(x), int(y)
-
-if __name__ == "__main__":
-    
-    # symbol names to be input by user
-    Y = input("Enter Symbol for 1st company (Y): ")
-    X = input("Enter Symbol for 2nd company (X): ")
+    # symbol names to be input by user, unless given (stock_cli.py)
+    if Y is None:
+        Y = input("Enter Symbol for 1st company (Y): ")
+    if X is None:
+        X = input("Enter Symbol for 2nd company (X): ")
     print("\n")
 
     
     # open file for results
     date_today = str(datetime.date.today())
-    fname = "/home/euler/Documents/Projects/Stock/backtest_result_" +\
-        date_today + Y + "_" + X + ".csv"
-    fd = open(fname, "w+")
-    
-    # writing headers
-    fd.write("Signal Date,")
-    fd.write("Exit Date,")
-    fd.write("Signal Type,")
-    fd.write("Profit/Loss,")
-    fd.write("Qty. X,")
-    fd.write("Qty. Y,")
-    fd.write("\n")
+    sink = ResultSink("backtest_result_" + date_today + Y + "_" + X,
+                      [("Signal Date", "str"),
+                       ("Exit Date", "str"),
+                       ("Signal Type", "str"),
+                       ("Profit/Loss", "float"),
+                       ("Qty. X", "int"),
+                       ("Qty. Y", "int")])
 
     # download historical data
-    Y_data, time_frame1 = download_history(Y)
-    X_data, time_frame2 = download_history(X)
-    
-    if len(Y_data) != len(X_data):
-        print("ERROR: Unequal Length ", Y, " & ", X)
-        fd.write(Y+"_"+X+","+"ERROR")
-        fd.write("\n")
+    Y_close, Y_times, tz = load_history(Y)
+    X_close, X_times, tz = load_history(X)
+
+    # bars common to both stock, gaps handled per config.ALIGN_POLICY
+    times, Y_data, X_data = align_pair(Y_times, Y_close, X_times, X_close)
+
+    if len(Y_data) < config.MIN_COMMON_BARS:
+        print("ERROR: Too few common bars ", Y, " & ", X)
+        sink.write((Y+"_"+X, "ERROR"))
+        sink.close()
         sys.exit()
 
     datalen = len(Y_data)
 
     #===============================M1 Signal==============================
     cdf_arr = M1_cdf(X_data, Y_data, datalen)
-
-    trade_inprogress = 0
-    # start and end prices for X & Y
-    x1 = 0
-    y1 = 0
-    x2 = 0
-    y2 = 0
-
-    signal = ""
-    trade_start_idx = 0
-    
-    for i in range(datalen):
-        result_bucket = ""        
-        cdf = cdf_arr[i]
-        if trade_inprogress == 0:
-            signal = M1_signal(cdf)
-            y1 = Y_data[i]
-            x1 = X_data[i]
-            X_qty, Y_qty = diophantine(x1, y1)
-            trade_start_idx = i
-        
-        if signal == "LONG":
-            trade_inprogress = 1
-            if (cdf < 0.3) or (cdf > 2.5):
-                trade_inprogress = 0
-                y2 = Y_data[i]
-                x2 = X_data[i]
-                measure = (y2-y1)*Y_qty + (x1-x2)*X_qty
-                trade_inprogress = 0
-                result_bucket += str(time_frame1[trade_start_idx]) + "," + \
-                    str(time_frame1[i]) + "," + "M1_" + signal + "," + \
-                        str(measure) + "," + str(X_qty) + "," + str(Y_qty) + "\n"
-                fd.write(result_bucket)
-        elif signal == "SHORT":
-            trade_inprogress = 1
-            if (cdf < 97.5) or (cdf > 99.7):
-                trade_inprogress = 0
-                y2 = Y_data[i]
-                x2 = X_data[i]
-                measure = (y1-y2)*Y_qty + (x2-x1)*X_qty
-                trade_inprogress = 0
-                result_bucket += str(time_frame1[trade_start_idx]) + "," + \
-                    str(time_frame1[i]) + "," + "M1_" + signal + "," + \
-                        str(measure) + "," + str(X_qty) + "," + str(Y_qty) + "\n"
-                fd.write(result_bucket)
-        else:
-            pass
+    write_trades(sink, find_trades(cdf_arr, X_data, Y_data, M1_RULE),
+                 times, tz, "M1")
     #======================================================================
 
     #===============================M2 Signal==============================
     std_err_arr = M2_std_err(X_data, Y_data)
+    write_trades(sink, find_trades(std_err_arr, X_data, Y_data, M2_RULE),
+                 times, tz, "M2")
+    #======================================================================
 
-    trade_inprogress = 0
-    # start and end prices for X & Y
-    x1 = 0
-    y1 = 0
-    x2 = 0
-    y2 = 0
-
-    signal = ""
-    trade_start_idx = 0
+    sink.close()
 
-    for i in range(datalen):
-        result_bucket = ""
-        std_err = std_err_arr[i]
-        if trade_inprogress == 0:
-            signal = M2_signal(std_err)
-            y1 = Y_data[i]
-            x1 = X_data[i]
-            X_qty, Y_qty = diophantine(x1, y1)
-            trade_start_idx = i
-        
-        if signal == "LONG":
-            trade_inprogress = 1
-            if (std_err < -3.0) or (std_err > -2.0):
-                trade_inprogress = 0
-                y2 = Y_data[i]
-                x2 = X_data[i]
-                measure = (y2-y1)*Y_qty + (x1-x2)*X_qty
-                trade_inprogress = 0
-                result_bucket += str(time_frame1[trade_start_idx]) + "," + \
-                    str(time_frame1[i]) + "," + "M2_" + signal + "," + \
-                        str(measure) + "," + str(X_qty) + "," + str(Y_qty) + "\n"
-                fd.write(result_bucket)
-        elif signal == "SHORT":
-            trade_inprogress = 1
-            if (std_err < 2) or (std_err > 3):
-                trade_inprogress = 0
-                y2 = Y_data[i]
-                x2 = X_data[i]
-                measure = (y1-y2)*Y_qty + (x2-x1)*X_qty
-                trade_inprogress = 0
-                result_bucket += str(time_frame1[trade_start_idx]) + "," + \
-                    str(time_frame1[i]) + "," + "M2_" + signal + "," + \
-                        str(measure) + "," + str(X_qty) + "," + str(Y_qty) + "\n"
-                fd.write(result_bucket)
-        else:
-            pass
-    #======================================================================
 
-    fd.close()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
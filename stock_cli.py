@@ -0,0 +1,158 @@
+#! /usr/bin/python3.8
+
+"""
+DoC - October, 18th Oct, 2026
+Description - Single command line entry point for the stock scripts
+Inputs by User - subcommand and its arguments, see stock_cli.py -h
+Authors - L & JJ
+
+1. Subcommands:
+   analyze SYM1 SYM2    - stock-4.py, regression and ADF of one pair
+   scan [LIST]          - stock-batch-1.py, all pairs of a symbol list,
+                          --incremental to reuse the stored pair sums,
+                          --progress SECONDS for throughput and ETA,
+                          --top K for a ranked shortlist of K pairs
+   backtest [PAIRS]     - stock_back_test.py, pairs of a filtered result,
+                          --sweep for a grid of signal thresholds
+   backtest-single Y X  - stock_back_test_single.py, trades of one pair
+   monitor [PAIRS]      - live_monitor.py, live signals of the pairs of a
+                          filtered result, --replay BARS to play the
+                          last bars of the history instead of polling
+   benchmark [OPTIONS]  - benchmark.py, stage timings on synthetic data,
+                          options are passed on (stock_cli.py benchmark -h)
+2. Only the module of the chosen subcommand is imported. Heavy libraries
+   are imported where they are used (statsmodels for the analyze
+   summary, matplotlib for its plot, pandas/yfinance on download), so
+   e.g. a scan from a warm cache does not load them at all
+3. Import time of the subcommand module is printed on stderr; for a
+   detailed breakdown run with python -X importtime
+"""
+
+import os
+import sys
+import time
+import argparse
+import importlib.util
+
+
+_SCRIPTS = {
+    "analyze": "stock-4.py",
+    "scan": "stock-batch-1.py",
+    "backtest": "stock_back_test.py",
+    "backtest-single": "stock_back_test_single.py",
+    "monitor": "live_monitor.py",
+    "benchmark": "benchmark.py",
+}
+
+
+def load_script(command):
+    # scripts are loaded from their file, stock-4.py and stock-batch-1.py
+    # are not valid module names
+    fname = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         _SCRIPTS[command])
+    name = os.path.splitext(os.path.basename(fname))[0].replace("-", "_")
+    spec = importlib.util.spec_from_file_location(name, fname)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="stock_cli.py",
+        description="Pair trading analysis of stocks")
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    commands.required = True
+
+    analyze = commands.add_parser(
+        "analyze", help="regression and ADF test of one pair")
+    analyze.add_argument("symbol_1")
+    analyze.add_argument("symbol_2")
+    analyze.add_argument("--no-summary", action="store_true",
+                         help="skip the statsmodels summary")
+    analyze.add_argument("--no-plot", action="store_true",
+                         help="skip the residuals plot")
+
+    scan = commands.add_parser(
+        "scan", help="batch scan of all pairs of a symbol list")
+    scan.add_argument("list_file", nargs="?",
+                      help="symbol list, default list.csv in DATA_DIR")
+    scan.add_argument("--incremental", action="store_true", default=None,
+                      help="update stored pair statistics with new bars "
+                      "only (scan_state.py)")
+    scan.add_argument("--progress", type=float, metavar="SECONDS",
+                      help="print throughput and ETA every SECONDS")
+    scan.add_argument("--top", type=int, metavar="K",
+                      help="write only the K best pairs after the staged "
+                      "filters (pair_screen.py)")
+
+    backtest = commands.add_parser(
+        "backtest", help="back test of the pairs of a filtered result")
+    backtest.add_argument(
+        "pairs_file", nargs="?",
+        help="pairs file, default batch_result_filtered.csv in DATA_DIR")
+    backtest.add_argument("--sweep", action="store_true",
+                          help="test all threshold combinations of the "
+                          "SWEEP_* grids in config.py")
+
+    single = commands.add_parser(
+        "backtest-single", help="trades of the back test of one pair")
+    single.add_argument("Y")
+    single.add_argument("X")
+
+    monitor = commands.add_parser(
+        "monitor", help="live M1/M2 signals of the pairs of a result")
+    monitor.add_argument(
+        "pairs_file", nargs="?",
+        help="pairs file, default batch_result_filtered.csv in DATA_DIR")
+    monitor.add_argument("--replay", type=int, metavar="BARS",
+                         help="replay the last BARS bars of the history")
+    monitor.add_argument("--delay", type=float, default=0.0,
+                         metavar="SECONDS",
+                         help="pause between replayed bars")
+    monitor.add_argument("--poll", type=float, metavar="SECONDS",
+                         help="seconds between price requests, default "
+                         "MONITOR_POLL in config.py")
+
+    bench = commands.add_parser(
+        "benchmark", add_help=False,
+        help="stage timings of the scan and back test on synthetic data")
+
+    # options of benchmark are parsed by benchmark.py itself
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command != "benchmark":
+        parser.error("unrecognized arguments: " + " ".join(extra))
+    args.options = extra
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if getattr(args, "progress", None) is not None:
+        # read by config.py when the script is loaded
+        os.environ["STOCK_PROGRESS_INTERVAL"] = str(args.progress)
+    if getattr(args, "top", None) is not None:
+        os.environ["STOCK_SCREEN_TOP_K"] = str(args.top)
+
+    start = time.perf_counter()
+    script = load_script(args.command)
+    print("Import time: %.3f s" % (time.perf_counter() - start),
+          file=sys.stderr)
+
+    if args.command == "analyze":
+        script.main(args.symbol_1, args.symbol_2,
+                    summary=not args.no_summary, plot=not args.no_plot)
+    elif args.command == "scan":
+        script.main(args.list_file, args.incremental)
+    elif args.command == "backtest":
+        script.main(args.pairs_file, args.sweep)
+    elif args.command == "monitor":
+        script.main(args.pairs_file, args.replay, args.delay, args.poll)
+    elif args.command == "benchmark":
+        script.main(args.options)
+    else:
+        script.main(args.Y, args.X)
+
+
+if __name__ == "__main__":
+    main()
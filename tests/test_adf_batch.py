@@ -0,0 +1,44 @@
+import warnings
+import numpy as np
+import pytest
+
+from adf_batch import adf_batch
+
+adfuller = pytest.importorskip("statsmodels.tsa.stattools").adfuller
+
+
+def _series(length, seed):
+    # stationary AR(1) and random walk rows
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal((6, length))
+    rows = [np.cumsum(noise[0]), np.cumsum(noise[1])]
+    for phi, k in ((0.2, 2), (0.5, 3), (0.9, 4), (0.97, 5)):
+        row = np.zeros(length)
+        for t in range(1, length):
+            row[t] = phi * row[t - 1] + noise[k, t]
+        rows.append(row)
+    return np.array(rows)
+
+
+@pytest.mark.parametrize("length", [60, 250, 1000])
+@pytest.mark.parametrize("autolag", ["AIC", None])
+def test_matches_adfuller(length, autolag):
+    series = _series(length, length)
+    maxlag = None if autolag else 3
+    adfstat, pvalue, usedlag, nobs = adf_batch(series, maxlag, autolag)
+    for k, row in enumerate(series):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            ref = adfuller(row, maxlag=maxlag, regression="n",
+                           autolag=autolag)
+        assert usedlag[k] == ref[2]
+        assert nobs[k] == ref[3]
+        assert np.isclose(adfstat[k], ref[0], rtol=1e-8, atol=1e-10)
+        assert np.isclose(pvalue[k], ref[1], rtol=1e-8, atol=1e-12)
+
+
+def test_constant_series_is_nan():
+    series = np.vstack([np.ones(100), _series(100, 1)[0]])
+    series[1, 10] = np.nan
+    adfstat, pvalue = adf_batch(series)[:2]
+    assert np.isnan(adfstat).all() and np.isnan(pvalue).all()
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from backtest_engine import find_trades, loop_trades, pad_rows, m1_rule, \
+    m2_rule
+
+RULES = [m1_rule(0.3, 2.5), m1_rule(1.0, 10.0),
+         m2_rule(2.5, 2.0, 3.0), m2_rule(1.0, 0.5, 2.0)]
+
+
+def _signals(rule, seed, count=40):
+    # random rows of different lengths, NaN padded, some NaN bars inside
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, 300, count)
+    values, xs, ys = [], [], []
+    for length in lengths:
+        walk = np.cumsum(rng.standard_normal(length)) * 0.7
+        if rule["long_entry"][0] >= 0:
+            # M1: a cdf in %, often near both ends
+            row = 100 / (1 + np.exp(-walk))
+        else:
+            row = walk
+        row[rng.random(length) < 0.05] = np.nan
+        values.append(row)
+        xs.append(rng.uniform(10, 200, length))
+        ys.append(rng.uniform(10, 200, length))
+    return pad_rows(values), pad_rows(xs), pad_rows(ys), lengths
+
+
+@pytest.mark.parametrize("rule", RULES)
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_find_trades_matches_loop(rule, seed):
+    values, x, y, lengths = _signals(rule, seed)
+    trades = find_trades(values, x, y, rule)
+
+    expected = {key: [] for key in trades}
+    for k, length in enumerate(lengths):
+        table = loop_trades(values[k, :length], x[k, :length],
+                            y[k, :length], rule)
+        table["pair"] = [k] * len(table["entry"])
+        for key in expected:
+            expected[key].extend(table[key])
+
+    assert len(trades["entry"]) > 0
+    for key in ("pair", "entry", "exit", "long", "x_qty", "y_qty"):
+        assert list(trades[key]) == list(expected[key]), key
+    assert np.allclose(trades["measure"], expected["measure"])
+
+
+def test_loop_on_padding_is_unchanged():
+    # NaN padding after a row neither opens nor closes trades
+    rule = RULES[2]
+    values, x, y, lengths = _signals(rule, 3, count=1)
+    short = loop_trades(values[0, :lengths[0]], x[0, :lengths[0]],
+                        y[0, :lengths[0]], rule)
+    padded = find_trades(np.append(values[0], [np.nan] * 20),
+                         np.append(x[0], [np.nan] * 20),
+                         np.append(y[0], [np.nan] * 20), rule)
+    assert list(padded["entry"]) == short["entry"]
+    assert list(padded["exit"]) == short["exit"]